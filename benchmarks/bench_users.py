@@ -0,0 +1,66 @@
+"""Time resolving every scalar field of many users, the cost of large `users` responses.
+
+Users are made up, so no murmurd is needed:
+
+    python benchmarks/bench_users.py [USERS]
+
+Run it on a checkout from before a change to compare.
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+import strawberry
+
+from records import UserRecord
+from schema_types import User
+
+QUERY = '''{
+  users {
+    id userId name comment channel mute selfMute deaf selfDeaf suppress recording
+    onlineSecs idleSecs bytesPerSec os osVersion version release
+  }
+}'''
+
+
+def make_users(count: int) -> list[UserRecord]:
+    return [
+        UserRecord(
+            session=n, userid=n if n % 2 else -1, name=f'user{n}', comment='', channel=n % 20,
+            mute=False, deaf=False, suppress=False, prioritySpeaker=False,
+            selfMute=n % 3 == 0, selfDeaf=False, recording=False,
+            onlinesecs=n * 10, idlesecs=n, bytespersec=4000,
+            os='Linux', osversion='6.1', version=0x10500, version2=0, release='1.5.0',
+            address=bytes(10) + b'\xff\xff' + bytes([10, 0, n // 256 % 256, n % 256]),
+        )
+        for n in range(1, count + 1)
+    ]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    users = make_users(count)
+
+    @strawberry.type
+    class Query:
+        @strawberry.field
+        def users(self) -> list[User]:
+            return [User(u, None) for u in users]
+
+    schema = strawberry.Schema(query=Query)
+    result = schema.execute_sync(QUERY)
+    assert not result.errors, result.errors
+
+    timings = []
+    for _ in range(10):
+        start = time.perf_counter()
+        schema.execute_sync(QUERY)
+        timings.append(time.perf_counter() - start)
+
+    print(f"{count} users: best {min(timings) * 1000:.1f} ms, median {sorted(timings)[5] * 1000:.1f} ms of 10 runs")
+
+
+if __name__ == '__main__':
+    main()
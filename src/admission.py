@@ -0,0 +1,246 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+from collections.abc import AsyncGenerator
+from contextlib import aclosing, contextmanager
+from typing import Any, Callable
+
+import Ice
+import strawberry
+from graphql import FieldNode, GraphQLError, OperationDefinitionNode, OperationType
+from strawberry.extensions import SchemaExtension
+from strawberry.types.execution import PreExecutionError
+
+from mumble import get_server_id
+from utils import get_operation, is_shared_context
+
+# Tokens per second and burst size of each client's bucket per mutation/subscription field
+RATE_LIMIT_PER_SECOND = float(os.environ.get('RATE_LIMIT_PER_SECOND') or 10)
+RATE_LIMIT_BURST = float(os.environ.get('RATE_LIMIT_BURST') or 20)
+
+# Per field overrides as `field=rate/burst,...`, such as `broadcastMessage=0.1/2`
+RATE_LIMITS = os.environ.get('RATE_LIMITS') or ''
+
+MAX_SUBSCRIPTIONS_PER_CONNECTION = int(os.environ.get('MAX_SUBSCRIPTIONS_PER_CONNECTION') or 20)
+
+# Maximum concurrent async Ice invocations made to a single virtual server
+MAX_INFLIGHT_ICE_CALLS = int(os.environ.get('MAX_INFLIGHT_ICE_CALLS') or 32)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens < 1:
+            return False
+
+        self.tokens -= 1
+        return True
+
+    @property
+    def idle(self) -> bool:
+        """If the bucket would be full by now, and can be recreated on demand"""
+        return self.tokens + (time.monotonic() - self.updated) * self.rate >= self.burst
+
+
+class RateLimiter:
+    """Token buckets per (client, operation)"""
+
+    # Idle buckets are pruned once there are more than this many
+    max_buckets = 10000
+
+    def __init__(self, rate: float, burst: float, overrides: dict[str, tuple[float, float]] | None = None):
+        self.rate = rate
+        self.burst = burst
+        self.overrides = overrides or {}
+        self._buckets: dict[tuple[str, str], TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, client: str, operation: str) -> bool:
+        rate, burst = self.overrides.get(operation, (self.rate, self.burst))
+        if rate <= 0:
+            return True
+
+        with self._lock:
+            bucket = self._buckets.get((client, operation))
+            if bucket is None:
+                if len(self._buckets) >= self.max_buckets:
+                    self._prune()
+
+                bucket = TokenBucket(rate, burst)
+                self._buckets[(client, operation)] = bucket
+
+            return bucket.take()
+
+    def _prune(self):
+        for key in [k for k, b in self._buckets.items() if b.idle]:
+            del self._buckets[key]
+
+
+def parse_rate_limits(spec: str) -> dict[str, tuple[float, float]]:
+    """Parse `field=rate/burst,...` overrides"""
+    overrides = {}
+    for item in filter(None, (s.strip() for s in spec.split(','))):
+        field, limit = item.split('=')
+        rate, burst = limit.split('/')
+        overrides[field.strip()] = (float(rate), float(burst))
+
+    return overrides
+
+
+rate_limiter = RateLimiter(
+    RATE_LIMIT_PER_SECOND,
+    RATE_LIMIT_BURST,
+    parse_rate_limits(RATE_LIMITS)
+)
+
+
+def get_client_key(context) -> str:
+    """Identify the client of a request by address.
+
+    Headers such as `X-API-Key` are left out, the API doesn't check them
+    and anyone could send a new one with every request.
+    """
+    request = context.get('request') if isinstance(context, dict) else None
+    if request is None or request.client is None:
+        return 'unknown'
+
+    return f'ip:{request.client.host}'
+
+
+def check_rate_limits(operation: OperationDefinitionNode, client: str):
+    """Raise if the client is over the rate limit of any root field of a mutation or subscription"""
+    if operation.operation == OperationType.QUERY:
+        return
+
+    for selection in operation.selection_set.selections:
+        if isinstance(selection, FieldNode) and not rate_limiter.allow(client, selection.name.value):
+            raise GraphQLError(
+                f"Rate limit exceeded for {selection.name.value}",
+                extensions={'code': 'RATE_LIMITED'}
+            )
+
+
+def acquire_subscription_slot(context) -> bool:
+    """Count a subscription against the limit of its websocket connection, raising if it is full.
+
+    Returns if a slot was taken, to be given back with `release_subscription_slot`.
+    """
+    if not isinstance(context, dict) or is_shared_context(context):
+        return False
+
+    # Websocket connections share one context across their subscriptions
+    active = context.get('active_subscriptions', 0)
+    if active >= MAX_SUBSCRIPTIONS_PER_CONNECTION:
+        raise GraphQLError(
+            f"Too many subscriptions on this connection (max {MAX_SUBSCRIPTIONS_PER_CONNECTION})",
+            extensions={'code': 'TOO_MANY_SUBSCRIPTIONS'}
+        )
+
+    context['active_subscriptions'] = active + 1
+    return True
+
+
+def release_subscription_slot(context):
+    context['active_subscriptions'] -= 1
+
+
+@contextmanager
+def subscription_slot(context):
+    """Count a subscription against the limit of its websocket connection while it is open"""
+    acquired = acquire_subscription_slot(context)
+    try:
+        yield
+    finally:
+        if acquired:
+            release_subscription_slot(context)
+
+
+async def hold_subscription_slot(context, results: AsyncGenerator) -> AsyncGenerator:
+    """Iterate the results of a subscription while it holds a slot of its connection.
+
+    Yields an error instead if the connection has no free slot.
+    """
+    try:
+        acquired = acquire_subscription_slot(context)
+    except GraphQLError as error:
+        await results.aclose()
+        yield PreExecutionError(data=None, errors=[error])
+        return
+
+    try:
+        async with aclosing(results):
+            async for result in results:
+                yield result
+    finally:
+        if acquired:
+            release_subscription_slot(context)
+
+
+class AdmissionSchema(strawberry.Schema):
+    """Schema capping the number of subscriptions open on one websocket connection.
+
+    Extension hooks only wrap the start of a subscription, not the time its
+    results are streamed, so the slot is held by wrapping the results instead.
+    This covers every websocket protocol and subscription.
+    """
+
+    async def subscribe(
+        self,
+        query: str | None,
+        variable_values: dict[str, Any] | None = None,
+        context_value: Any | None = None,
+        root_value: Any | None = None,
+        operation_name: str | None = None,
+    ):
+        results = await super().subscribe(query, variable_values, context_value, root_value, operation_name)
+        if not isinstance(results, AsyncGenerator):
+            return results
+
+        return hold_subscription_slot(context_value, results)
+
+
+class AdmissionControlExtension(SchemaExtension):
+    """Apply rate limits to mutations and subscriptions before they resolve.
+    The subscriptions open on one connection are capped by `AdmissionSchema`.
+    """
+
+    def on_execute(self):
+        context = self.execution_context
+        operation = get_operation(context.graphql_document, context.operation_name)
+
+        # Shared subscriptions admit each of their clients when they join
+        if operation is None or is_shared_context(context.context):
+            yield
+            return
+
+        check_rate_limits(operation, get_client_key(context.context))
+        yield
+
+
+# Mapping between an event loop -> server_id -> semaphore bounding async Ice calls to it.
+# Semaphores can only be awaited from the loop they were first used in.
+_ice_call_slots: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[int, asyncio.Semaphore]] = \
+    weakref.WeakKeyDictionary()
+
+
+async def call_ice(server, invoke: Callable[[], Ice.Future]):
+    """Start an async Ice invocation once the server has a free call slot, and await it"""
+    server_id = get_server_id(server)
+    loop_slots = _ice_call_slots.setdefault(asyncio.get_running_loop(), {})
+    slots = loop_slots.get(server_id)
+    if slots is None:
+        slots = loop_slots[server_id] = asyncio.Semaphore(MAX_INFLIGHT_ICE_CALLS)
+
+    async with slots:
+        return await Ice.wrap_future(invoke())
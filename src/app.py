@@ -1,5 +1,9 @@
 # autopep8: off
+import time
+_import_start = time.perf_counter()
+
 import logging
+import os
 import sys
 from pathlib import Path
 from contextlib import asynccontextmanager
@@ -11,29 +15,63 @@ if str(parent_dir) not in sys.path:
 
 
 import asyncio
-import strawberry
 from fastapi import FastAPI
 
-from strawberry.fastapi import GraphQLRouter
+from strawberry.extensions import ParserCache, QueryDepthLimiter, ValidationCache
 
 from mumble import mumble_heartbeat
+from events import text_message_events, user_change_events, channel_change_events
+from event_bus import forward_event
 from query import Query
 from mutation import Mutation
 from subscription import Subscription
+from persisted_queries import PersistedQueryRouter, persisted_query_store
+from response_cache import ResponseCacheExtension, invalidate_event_server
+from query_cost import QueryCostExtension
+from admission import AdmissionControlExtension, AdmissionSchema
+from resilience import DeadlineExtension
+from permissions import invalidate_channel_permissions, invalidate_user_permissions
+from registry import apply_registration_event
+from snapshots import apply_channel_event, apply_user_event
 
-schema = strawberry.Schema(
+schema = AdmissionSchema(
     query=Query,
     mutation=Mutation,
-    subscription=Subscription
+    subscription=Subscription,
+    extensions=[
+        # Dashboards repeat the same few documents, keep parse/validate off the hot path
+        ParserCache(maxsize=persisted_query_store.maxsize),
+        ValidationCache(maxsize=persisted_query_store.maxsize),
+        QueryDepthLimiter(max_depth=int(os.environ.get('QUERY_DEPTH_LIMIT') or 10)),
+        AdmissionControlExtension,
+        QueryCostExtension,
+        ResponseCacheExtension,
+        DeadlineExtension,
+    ]
 )
 
-graphql_app = GraphQLRouter(schema)
+user_change_events.add_listener(apply_user_event)
+user_change_events.add_listener(invalidate_event_server)
+channel_change_events.add_listener(apply_channel_event)
+channel_change_events.add_listener(invalidate_event_server)
+user_change_events.add_listener(invalidate_user_permissions)
+user_change_events.add_listener(apply_registration_event)
+channel_change_events.add_listener(invalidate_channel_permissions)
+
+# Other workers only see events the ingest worker forwards
+for manager in (text_message_events, user_change_events, channel_change_events):
+    manager.add_listener(forward_event)
+
+graphql_app = PersistedQueryRouter(schema, persisted_query_store)
+
+print(f"Imported app and built schema in {(time.perf_counter() - _import_start) * 1000:.1f}ms")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     scheduler = BackgroundScheduler()
     scheduler.add_job(mumble_heartbeat, "interval", seconds = 30)
     scheduler.start()
+    print(f"Startup complete in {(time.perf_counter() - _import_start) * 1000:.1f}ms")
     yield
 
 app = FastAPI(lifespan=lifespan)
@@ -0,0 +1,187 @@
+import ipaddress
+import os
+import threading
+import time
+from typing import TYPE_CHECKING
+
+import strawberry
+
+from mumble import get_server_id
+from slice_loader import get_slice_module
+from utils import address_tuple_to_ipv6
+
+if TYPE_CHECKING:
+    import MumbleServer
+
+# Seconds before the cached ban list of a server is fetched again.
+# Bans made through the API update it right away, bans made in a client only after this.
+BAN_CACHE_TTL = float(os.environ.get('BAN_CACHE_TTL') or 30)
+
+# murmurd stores IPv4 addresses mapped into IPv6, as ::ffff:a.b.c.d
+IPV4_MAPPED = ipaddress.IPv6Network('::ffff:0:0/96')
+
+
+def parse_network(address: str) -> ipaddress.IPv6Network:
+    """Parse an IPv4 or IPv6 address or CIDR range to the IPv6 range murmurd uses"""
+    try:
+        network = ipaddress.ip_network(address, strict=False)
+    except ValueError:
+        raise ValueError(f"Invalid address: {address}")
+
+    if network.version == 4:
+        mapped = int(IPV4_MAPPED.network_address) | int(network.network_address)
+        return ipaddress.IPv6Network((mapped, 96 + network.prefixlen))
+
+    return network
+
+
+def get_ban_network(ban: "MumbleServer.Ban") -> ipaddress.IPv6Network:
+    return ipaddress.IPv6Network((int(address_tuple_to_ipv6(ban.address)), ban.bits), strict=False)
+
+
+def format_network(network: ipaddress.IPv6Network) -> str:
+    """Format a range as CIDR, IPv4 mapped ranges as IPv4"""
+    if network.prefixlen >= 96 and network.subnet_of(IPV4_MAPPED):
+        return str(ipaddress.IPv4Network((network.network_address.ipv4_mapped, network.prefixlen - 96)))
+
+    return str(network)
+
+
+def is_ban_active(ban: "MumbleServer.Ban", now: float) -> bool:
+    # A duration of 0 is permanent
+    return ban.duration <= 0 or ban.start + ban.duration > now
+
+
+@strawberry.type(description="A ban of an address range.")
+class Ban:
+    address: str = strawberry.field(description="Banned range in CIDR notation, such as `10.0.0.0/8` or `2001:db8::/32`.")
+    name: str = strawberry.field(description="Name of the banned user.")
+    hash: str = strawberry.field(description="Certificate hash of the banned user.")
+    reason: str = strawberry.field(description="Reason for the ban.")
+    start: int = strawberry.field(description="Time the ban was applied in unix time format.")
+    duration: int = strawberry.field(description="Seconds the ban lasts. 0 is permanent.")
+
+    @classmethod
+    def from_ice(cls, ban: "MumbleServer.Ban") -> "Ban":
+        return cls(
+            address=format_network(get_ban_network(ban)),
+            name=ban.name,
+            hash=ban.hash,
+            reason=ban.reason,
+            start=ban.start,
+            duration=ban.duration
+        )
+
+
+@strawberry.input
+class BanInput:
+    address: str = strawberry.field(description="IPv4 or IPv6 address or CIDR range to ban. Replaces a ban of the same range.")
+    name: str = ""
+    hash: str = ""
+    reason: str = ""
+    duration: int = strawberry.field(default=0, description="Seconds the ban lasts. 0 is permanent.")
+
+
+@strawberry.type(description="Outcome of updating the bans of a server.")
+class BanUpdateResult:
+    added: int = strawberry.field(description="Number of bans added or replaced.")
+    removed: int = strawberry.field(description="Number of bans removed, not counting replaced ones.")
+    bans: list[Ban] = strawberry.field(description="All bans of the server after the update.")
+
+
+class BanIndex:
+    """Bans of a server, indexed by prefix length and the masked network address.
+
+    CIDR ranges either nest or don't overlap, so the bans covering an address
+    are found with one lookup per distinct prefix length in the list, however
+    many bans there are.
+    """
+
+    def __init__(self, bans: list["MumbleServer.Ban"]):
+        self.created = time.monotonic()
+        self.bans = bans
+        # Mapping between a prefix length -> {network address: bans of that range}
+        self.prefixes: dict[int, dict[int, list["MumbleServer.Ban"]]] = {}
+
+        for ban in bans:
+            network = get_ban_network(ban)
+            self.prefixes.setdefault(network.prefixlen, {}) \
+                .setdefault(int(network.network_address), []).append(ban)
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() - self.created > BAN_CACHE_TTL
+
+    def match(self, address: ipaddress.IPv6Address) -> list["MumbleServer.Ban"]:
+        """Get the active bans covering an address"""
+        value = int(address)
+        now = time.time()
+
+        matches = []
+        for bits, networks in self.prefixes.items():
+            mask = ((1 << bits) - 1) << (128 - bits)
+            matches += [b for b in networks.get(value & mask, ()) if is_ban_active(b, now)]
+
+        return matches
+
+
+# Mapping between a server_id -> index of its bans
+ban_indexes: dict[int, BanIndex] = {}
+
+# Mapping between a server_id -> lock held while its bans are updated
+_ban_locks: dict[int, threading.Lock] = {}
+
+
+def get_ban_index(server: "MumbleServer.ServerPrx") -> BanIndex:
+    """Get the cached bans of a server, fetching them once expired"""
+    server_id = get_server_id(server)
+    index = ban_indexes.get(server_id)
+    if index is None or index.expired:
+        index = ban_indexes[server_id] = BanIndex(list(server.getBans()))
+
+    return index
+
+
+def update_bans(
+    server: "MumbleServer.ServerPrx",
+    add: list[BanInput],
+    remove: list[str]
+) -> BanUpdateResult:
+    """Add and remove bans with a single setBans call, or none if nothing changes.
+
+    The new list is computed from the cached one, so bans made in a client
+    within `BAN_CACHE_TTL` seconds before may be overwritten.
+    """
+    MumbleServer = get_slice_module()
+    added = {parse_network(b.address): b for b in add}
+    removed = {parse_network(address) for address in remove}
+
+    server_id = get_server_id(server)
+    with _ban_locks.setdefault(server_id, threading.Lock()):
+        current = [(b, get_ban_network(b)) for b in get_ban_index(server).bans]
+        kept = [b for b, network in current if network not in removed and network not in added]
+        removed_count = sum(1 for _, network in current if network in removed and network not in added)
+
+        start = int(time.time())
+        bans = kept + [
+            MumbleServer.Ban(
+                address=tuple(network.network_address.packed),
+                bits=network.prefixlen,
+                name=b.name,
+                hash=b.hash,
+                reason=b.reason,
+                start=start,
+                duration=b.duration
+            )
+            for network, b in added.items()
+        ]
+
+        if added or removed_count:
+            server.setBans(bans)
+            ban_indexes[server_id] = BanIndex(bans)
+
+    return BanUpdateResult(
+        added=len(added),
+        removed=removed_count,
+        bans=[Ban.from_ice(b) for b in ban_indexes[server_id].bans]
+    )
@@ -0,0 +1,135 @@
+import Ice
+from schema_types import ChannelChangeEvent, ChannelChangeType, TextMessageEvent, UserChangeEvent, UserChangeType
+from events import text_message_events, user_change_events, channel_change_events
+from event_bus import forward_server_state
+from slice_loader import get_slice_module
+from mumble import get_server_id, set_server_booted
+from permissions import drop_permissions
+from records import ChannelRecord, UserRecord
+from response_cache import response_cache
+from snapshots import drop_snapshots
+
+# Callback servants have to subclass the generated skeletons, so this module
+# is only imported once the Slice module matching murmurd has been loaded.
+MumbleServer = get_slice_module()
+
+
+def apply_server_state(server_id: int, booted: bool):
+    """Update the state kept for a server after it started or stopped"""
+    set_server_booted(server_id, booted)
+    if not booted:
+        drop_snapshots(server_id)
+        drop_permissions(server_id)
+
+    response_cache.invalidate_server(server_id)
+
+
+class MetaCallback(MumbleServer.MetaCallback):
+    def __init__(self, adapter):
+        self.adapter = adapter
+
+    def started(self, server, current=None):
+        """ Called when a server is started.
+
+        The server is up and running when this event is sent,
+        so all methods that need a running server will work.
+        """
+        server_cb = MumbleServer.ServerCallbackPrx.uncheckedCast(
+            self.adapter.addWithUUID(ServerCallback(server, current.adapter))
+        )
+
+        server.addCallback(server_cb)
+        apply_server_state(get_server_id(server), True)
+        forward_server_state(get_server_id(server), True)
+
+    def stopped(self, server, current=None):
+        """ Called when a server is stopped.
+
+        The server is already stopped when this event is sent,
+        so no methods that need a running server will work.
+        """
+        apply_server_state(get_server_id(server), False)
+        forward_server_state(get_server_id(server), False)
+
+
+class ServerContextCallback(MumbleServer.ServerContextCallback):
+    """Callback for injecting additional content into the Murmur context menu"""
+
+    def __init__(self, server):
+        self.server = server
+
+    def contextAction(self, action, p, session, channel_id):
+        print(action, p)
+
+
+class ServerCallback(MumbleServer.ServerCallback):
+    """Callback for Murmur server events for a distinct server"""
+    _server: MumbleServer.ServerPrx
+    _adapter: Ice.ObjectAdapter
+
+    def __init__(self, server, adapter):
+        self._adapter = adapter
+        self._server = server
+
+        # self.contextR = Murmur.ServerContextCallbackPrx.uncheckedCast(
+        #     adapter.addWithUUID(ServerContextCallback(server))
+        # )
+
+    def userConnected(self, user, current=None):
+        user_change_events.publish(
+            UserChangeEvent(
+                UserChangeType.CONNECTED,
+                UserRecord.from_ice(user),
+                self._server
+            )
+        )
+
+    def userDisconnected(self, user, current=None):
+        user_change_events.publish(
+            UserChangeEvent(
+                UserChangeType.DISCONNECTED,
+                UserRecord.from_ice(user),
+                self._server
+            )
+        )
+
+    def userStateChanged(self, user, current=None):
+        user_change_events.publish(
+            UserChangeEvent(
+                UserChangeType.STATE_CHANGED,
+                UserRecord.from_ice(user),
+                self._server
+            )
+        )
+
+    def userTextMessage(self, user, msg: MumbleServer.TextMessage, current=None):
+        text_message_events.publish(
+            TextMessageEvent(UserRecord.from_ice(user), msg, self._server)
+        )
+
+    def channelCreated(self, channel, current=None):
+        channel_change_events.publish(
+            ChannelChangeEvent(
+                ChannelChangeType.CREATED,
+                ChannelRecord.from_ice(channel),
+                self._server
+            )
+        )
+
+    def channelRemoved(self, channel, current=None):
+        channel_change_events.publish(
+            ChannelChangeEvent(
+                ChannelChangeType.REMOVED,
+                ChannelRecord.from_ice(channel),
+                self._server
+            )
+        )
+
+    def channelStateChanged(self, channel, current=None):
+        channel_change_events.publish(
+            ChannelChangeEvent(
+                ChannelChangeType.STATE_CHANGED,
+                ChannelRecord.from_ice(channel),
+                self._server
+            )
+        )
@@ -0,0 +1,77 @@
+import os
+import time
+from typing import TYPE_CHECKING
+
+import strawberry
+
+from mumble import get_mumble_client, get_server_id
+
+if TYPE_CHECKING:
+    import MumbleServer
+
+# Seconds before the configuration of a server is fetched again.
+# Changes made through the API update it right away.
+CONFIG_CACHE_TTL = float(os.environ.get('CONFIG_CACHE_TTL') or 60)
+
+# Keys returned by the API, lowercase. Anything else, such as passwords, the TLS
+# key and its passphrase, Ice secrets and file paths, is left out.
+PUBLIC_CONFIG_KEYS = {
+    'welcometext', 'host', 'port', 'timeout', 'bandwidth', 'users', 'usersperchannel',
+    'textmessagelength', 'imagemessagelength', 'allowhtml', 'opusthreshold',
+    'channelnestinglimit', 'channelcountlimit', 'defaultchannel', 'rememberchannel',
+    'rememberchannelduration', 'username', 'channelname', 'certrequired',
+    'registername', 'registerurl', 'registerhostname', 'registerlocation',
+    'suggestversion', 'suggestpositional', 'suggestpushtotalk', 'sendversion',
+    'allowping', 'bonjour', 'messagelimit', 'messageburst', 'pluginmessagelimit',
+    'pluginmessageburst', 'broadcastlistenervolumeadjustments', 'listenersperchannel',
+    'listenersperuser', 'allowrecording', 'logdays', 'autobanattempts',
+    'autobantimeframe', 'autobantime', 'autobansuccessfulconnections',
+}
+
+
+@strawberry.type(description="A configuration item of a server.")
+class ConfigEntry:
+    key: str = strawberry.field(description="Configuration key, such as `welcometext`.")
+    value: str = strawberry.field(description="Configuration value, the murmurd default if the server doesn't set it.")
+
+
+class ConfigSnapshot:
+    def __init__(self, values: dict[str, str]):
+        self.created = time.monotonic()
+        self.values = values
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() - self.created > CONFIG_CACHE_TTL
+
+
+# Configuration set by murmurd itself (murmur.ini), which servers fall back to
+_default_config: ConfigSnapshot | None = None
+
+# Mapping between a server_id -> configuration set for that server
+config_snapshots: dict[int, ConfigSnapshot] = {}
+
+
+def get_server_config(server: "MumbleServer.ServerPrx") -> dict[str, str]:
+    """Get the configuration of a server, merged over the defaults.
+
+    Fetched with one getAllConf call per server (and one getDefaultConf call
+    for all), then served from cache for `CONFIG_CACHE_TTL` seconds.
+    """
+    global _default_config
+    if _default_config is None or _default_config.expired:
+        _default_config = ConfigSnapshot(get_mumble_client().meta.getDefaultConf())
+
+    server_id = get_server_id(server)
+    snapshot = config_snapshots.get(server_id)
+    if snapshot is None or snapshot.expired:
+        snapshot = config_snapshots[server_id] = ConfigSnapshot(server.getAllConf())
+
+    return {**_default_config.values, **snapshot.values}
+
+
+def set_cached_config(server_id: int, key: str, value: str):
+    """Update the cached configuration after a setConf call"""
+    snapshot = config_snapshots.get(server_id)
+    if snapshot is not None:
+        snapshot.values[key] = value
@@ -0,0 +1,230 @@
+import fcntl
+import os
+import queue
+import socket
+import threading
+import time
+from contextlib import suppress
+from typing import Any, Callable
+
+import msgpack
+
+from events import channel_change_events, text_message_events, user_change_events
+from mumble import get_mumble_client, get_server_id
+from records import ChannelRecord, UserRecord
+from schema_types import (
+    ChannelChangeEvent,
+    ChannelChangeType,
+    TextMessageEvent,
+    UserChangeEvent,
+    UserChangeType,
+)
+from slice_loader import get_slice_module
+
+# Unix socket shared by the workers of one deployment. When set, only one
+# worker registers Ice callbacks with murmurd and forwards events to the others.
+EVENT_BUS_SOCKET = os.environ.get('EVENT_BUS_SOCKET')
+
+
+class EventBus:
+    """Fan out events from the one worker that owns the Ice callbacks (the ingest)
+    to every other worker over a Unix socket.
+
+    The ingest is whichever worker holds a lock file next to the socket. If it
+    exits, the lock is released and the remaining workers elect a new one.
+    """
+
+    # Seconds a worker may stall reading events before the ingest drops it
+    send_timeout = 1.0
+
+    # Events queued for a worker before the ingest drops it
+    max_pending = 1000
+
+    def __init__(self, path: str):
+        self.path = path
+        self.is_ingest = False
+        self._on_ingest: Callable[[], None] | None = None
+        self._on_message: Callable[[dict[str, Any]], None] | None = None
+        self._lock_file = None
+        self._listener: socket.socket | None = None
+        # Mapping between a worker -> events waiting to be sent to it
+        self._workers: dict[socket.socket, queue.Queue] = {}
+        self._workers_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def start(self, on_ingest: Callable[[], None], on_message: Callable[[dict[str, Any]], None]):
+        """Join the bus, calling `on_ingest` if (and whenever) this worker becomes the ingest"""
+        self._on_ingest = on_ingest
+        self._on_message = on_message
+
+        if self.is_ingest:
+            # Reconnected to murmurd, callbacks have to be registered again
+            on_ingest()
+        elif self._thread is None:
+            self._elect()
+
+    def broadcast(self, message: dict[str, Any]):
+        """Queue a message for every worker. Called from Ice callbacks, so it never blocks on a worker."""
+        if not self.is_ingest:
+            return
+
+        data = msgpack.packb(message)
+        with self._workers_lock:
+            for worker, pending in list(self._workers.items()):
+                try:
+                    pending.put_nowait(data)
+                except queue.Full:
+                    self._drop(worker, f"more than {self.max_pending} events behind")
+
+    def _drop(self, worker: socket.socket, reason: str):
+        """Disconnect a worker, with `_workers_lock` held"""
+        if self._workers.pop(worker, None) is None:
+            return
+
+        print(f"Event bus: dropping worker: {reason}")
+        # Wakes its sender thread, which closes the socket
+        with suppress(OSError):
+            worker.shutdown(socket.SHUT_RDWR)
+
+    def _elect(self):
+        while True:
+            self._lock_file = open(f'{self.path}.lock', 'w')
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                self._lock_file.close()
+                self._lock_file = None
+
+            try:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.connect(self.path)
+            except (FileNotFoundError, ConnectionRefusedError):
+                # The ingest is still starting up, or just went away
+                sock.close()
+                time.sleep(0.2)
+                continue
+
+            self._thread = threading.Thread(target=self._consume, args=(sock,), daemon=True)
+            self._thread.start()
+            return
+
+        # Any socket file left is from an ingest that is gone
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Created owner only from the start, rather than changed after binding
+        umask = os.umask(0o177)
+        try:
+            self._listener.bind(self.path)
+        finally:
+            os.umask(umask)
+        self._listener.listen()
+
+        self.is_ingest = True
+        self._thread = threading.Thread(target=self._accept, daemon=True)
+        self._thread.start()
+
+        print(f"Event bus: ingesting Ice callbacks for all workers on {self.path}")
+        self._on_ingest()
+
+    def _accept(self):
+        while True:
+            worker, _ = self._listener.accept()
+            worker.settimeout(self.send_timeout)
+            pending = queue.Queue(self.max_pending)
+            with self._workers_lock:
+                self._workers[worker] = pending
+
+            threading.Thread(target=self._send, args=(worker, pending), daemon=True).start()
+
+    def _send(self, worker: socket.socket, pending: queue.Queue):
+        """Send queued events to one worker, so a stalled worker only holds up itself"""
+        try:
+            while True:
+                worker.sendall(pending.get())
+        except OSError as e:
+            with self._workers_lock:
+                self._drop(worker, str(e))
+        finally:
+            worker.close()
+
+    def _consume(self, sock: socket.socket):
+        print(f"Event bus: receiving events from {self.path}")
+
+        unpacker = msgpack.Unpacker()
+        try:
+            while data := sock.recv(65536):
+                unpacker.feed(data)
+                for message in unpacker:
+                    try:
+                        self._on_message(message)
+                    except Exception as e:
+                        print(f"Event bus: error handling {message.get('kind')} event: {e}")
+        except OSError:
+            pass
+        finally:
+            sock.close()
+
+        print("Event bus: ingest worker went away, electing a new one")
+        self._elect()
+
+
+event_bus = EventBus(EVENT_BUS_SOCKET) if EVENT_BUS_SOCKET else None
+
+
+def encode_event(event: UserChangeEvent | ChannelChangeEvent | TextMessageEvent) -> dict[str, Any]:
+    message = {'server_id': get_server_id(event._server)}
+    if isinstance(event, UserChangeEvent):
+        message.update(kind='user', change=event.changeType.value, user=event._user.as_dict())
+    elif isinstance(event, ChannelChangeEvent):
+        message.update(kind='channel', change=event.changeType.value, channel=event._channel.as_dict())
+    else:
+        message.update(kind='text', user=event._user.as_dict(), message=vars(event._message))
+
+    return message
+
+
+def forward_event(event):
+    """Event listener sending events of the ingest worker to all others"""
+    if event_bus is not None and event_bus.is_ingest:
+        event_bus.broadcast(encode_event(event))
+
+
+def forward_server_state(server_id: int, booted: bool):
+    if event_bus is not None and event_bus.is_ingest:
+        event_bus.broadcast({'kind': 'server', 'server_id': server_id, 'booted': booted})
+
+
+def receive_message(message: dict[str, Any]):
+    """Publish an event forwarded by the ingest worker as if its callback fired here"""
+    from callbacks import apply_server_state
+
+    if message['kind'] == 'server':
+        apply_server_state(message['server_id'], message['booted'])
+        return
+
+    server = get_mumble_client().servers_by_id.get(message['server_id'])
+    if server is None:
+        return
+
+    MumbleServer = get_slice_module()
+    if message['kind'] == 'user':
+        user_change_events.publish(UserChangeEvent(
+            UserChangeType(message['change']),
+            UserRecord(**message['user']),
+            server
+        ))
+    elif message['kind'] == 'channel':
+        channel_change_events.publish(ChannelChangeEvent(
+            ChannelChangeType(message['change']),
+            ChannelRecord(**message['channel']),
+            server
+        ))
+    elif message['kind'] == 'text':
+        text_message_events.publish(TextMessageEvent(
+            UserRecord(**message['user']),
+            MumbleServer.TextMessage(**message['message']),
+            server
+        ))
@@ -1,18 +1,37 @@
 
 import asyncio
-from typing import Any, Generic, AsyncGenerator, TypeVar
+import itertools
+from typing import Any, Callable, Generic, AsyncGenerator, TypeVar
 from uuid import UUID, uuid4
 
 from schema_types import ChannelChangeEvent, TextMessageEvent, UserChangeEvent
+from server_log import LogEntry
 
 TEvent = TypeVar("TEvent")
 
+# Order of events across all managers, stamped on each event as `_sequence`
+_sequence = itertools.count(1)
+
 
 class EventManager(Generic[TEvent]):
-    """Simple pub/sub for event subscriptions."""
+    """Simple pub/sub for event subscriptions.
+
+    Events published to a manager are also delivered to the subscribers of its `parent`.
+    """
 
-    def __init__(self):
+    def __init__(self, parent: "EventManager | None" = None):
         self._subscribers: dict[UUID, list[TEvent]] = {}
+        self._listeners: list[Callable[[TEvent], None]] = []
+        self._parent = parent
+
+    def add_listener(self, listener: Callable[[TEvent], None]):
+        """Call `listener` synchronously for every published event.
+
+        Listeners run on the publishing (Ice callback) thread and should be cheap.
+        They run before the event is queued for subscribers, so state they keep
+        current already includes any event a new subscriber has yet to receive.
+        """
+        self._listeners.append(listener)
 
     def add_subscriber(self) -> UUID:
         subscription_id = uuid4()
@@ -48,11 +67,27 @@ class EventManager(Generic[TEvent]):
 
     def publish(self, event: TEvent):
         print('Publish event', event)
+        event._sequence = next(_sequence)
+
+        for listener in self._listeners:
+            listener(event)
 
+        self._deliver(event)
+
+    def _deliver(self, event: TEvent):
         for subscriber in self._subscribers.values():
             subscriber.append(event)
 
+        if self._parent is not None:
+            self._parent._deliver(event)
+
+
+# Receives the events of all other managers, in publish order
+all_events = EventManager[TextMessageEvent | UserChangeEvent | ChannelChangeEvent]()
+
+text_message_events = EventManager[TextMessageEvent](parent=all_events)
+user_change_events = EventManager[UserChangeEvent](parent=all_events)
+channel_change_events = EventManager[ChannelChangeEvent](parent=all_events)
 
-text_message_events = EventManager[TextMessageEvent]()
-user_change_events = EventManager[UserChangeEvent]()
-channel_change_events = EventManager[ChannelChangeEvent]()
+# New log entries of the servers someone subscribed to, see `server_log.LogTail`
+server_log_events = EventManager[LogEntry]()
@@ -0,0 +1,172 @@
+import asyncio
+import json
+import weakref
+from contextlib import suppress
+
+from graphql import DocumentNode, FieldNode, GraphQLError, OperationDefinitionNode, OperationType, parse, print_ast
+from strawberry.extensions import ParserCache
+from strawberry.subscriptions.protocols.graphql_transport_ws.handlers import BaseGraphQLTransportWSHandler
+from strawberry.types import ExecutionResult
+from strawberry.types.execution import PreExecutionError
+from strawberry.types.graphql import OperationType as StrawberryOperationType
+
+from admission import check_rate_limits, get_client_key, subscription_slot
+from utils import get_operation
+from ws_encoding import EncodedPayload
+
+# Subscriptions streaming the same events to everyone, regardless of when they
+# subscribed or who they are. Others (such as `liveServer` starting with a
+# snapshot) are executed per client.
+SHARED_SUBSCRIPTIONS = {'textMessage', 'userChange', 'channelChange', 'events', 'serverLog'}
+
+
+def is_shareable(operation: OperationDefinitionNode | None) -> bool:
+    return operation is not None and operation.operation == OperationType.SUBSCRIPTION and all(
+        isinstance(s, FieldNode) and s.name.value in SHARED_SUBSCRIPTIONS
+        for s in operation.selection_set.selections
+    )
+
+
+def parse_query(schema, query: str) -> DocumentNode:
+    """Parse a document with the schema's `ParserCache`, if it has one"""
+    for extension in schema.extensions:
+        if isinstance(extension, ParserCache):
+            return extension.cached_parse_document(query)
+
+    return parse(query)
+
+
+class SubscriptionGroup:
+    """One execution of a subscription, with every result encoded once
+    and queued for each client subscribed with the same document and variables.
+    """
+
+    def __init__(self, hub: "SubscriptionHub", key: tuple, schema, query: str, variables: dict | None, operation_name: str | None):
+        self.hub = hub
+        self.key = key
+        self.members: set[asyncio.Queue] = set()
+        self.task = asyncio.create_task(self._run(schema, query, variables, operation_name))
+
+    async def _run(self, schema, query: str, variables: dict | None, operation_name: str | None):
+        try:
+            result_source = await schema.subscribe(
+                query=query,
+                variable_values=variables,
+                operation_name=operation_name,
+                context_value={'shared_subscription': True},
+            )
+
+            if isinstance(result_source, ExecutionResult):
+                self._broadcast(('error', result_source.errors))
+                return
+
+            is_first_result = True
+            async for result in result_source:
+                if is_first_result and isinstance(result, PreExecutionError):
+                    self._broadcast(('error', result.errors))
+                    return
+
+                payload = {'data': result.data}
+                if result.errors:
+                    payload['errors'] = [e.formatted for e in result.errors]
+                if result.extensions:
+                    payload['extensions'] = result.extensions
+
+                self._broadcast(('next', EncodedPayload(payload)))
+                is_first_result = False
+        finally:
+            self._broadcast(('complete', None))
+            if self.hub.groups.get(self.key) is self:
+                del self.hub.groups[self.key]
+
+    def _broadcast(self, message: tuple):
+        for queue in self.members:
+            queue.put_nowait(message)
+
+
+class SubscriptionHub:
+    def __init__(self):
+        self.groups: dict[tuple, SubscriptionGroup] = {}
+
+    def join(self, schema, query: str, variables: dict | None, operation_name: str | None) -> tuple[SubscriptionGroup, asyncio.Queue]:
+        """Join the group executing `query`, which should be normalized (see `print_ast`)
+        so documents only differing in whitespace or comments share a group.
+        """
+        key = (query, json.dumps(variables, sort_keys=True), operation_name)
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = SubscriptionGroup(self, key, schema, query, variables, operation_name)
+
+        queue = asyncio.Queue()
+        group.members.add(queue)
+        return group, queue
+
+    def leave(self, group: SubscriptionGroup, queue: asyncio.Queue):
+        group.members.discard(queue)
+        if not group.members:
+            group.task.cancel()
+            if self.groups.get(group.key) is group:
+                del self.groups[group.key]
+
+
+# Mapping between an event loop -> hub of the subscriptions executing in it
+_hubs: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, SubscriptionHub] = weakref.WeakKeyDictionary()
+
+
+def get_subscription_hub() -> SubscriptionHub:
+    return _hubs.setdefault(asyncio.get_running_loop(), SubscriptionHub())
+
+
+class FanOutGraphQLTransportWSHandler(BaseGraphQLTransportWSHandler):
+    """graphql-transport-ws handler that joins clients subscribing with the same
+    document and variables into one execution, see `SHARED_SUBSCRIPTIONS`.
+
+    Rate limits and the per connection subscription cap still apply to each client.
+    """
+
+    async def run_operation(self, operation) -> None:
+        if operation.operation_type != StrawberryOperationType.SUBSCRIPTION:
+            return await super().run_operation(operation)
+
+        document = parse_query(self.schema, operation.query)
+
+        definition = get_operation(document, operation.operation_name)
+        if not is_shareable(definition):
+            return await super().run_operation(operation)
+
+        try:
+            try:
+                check_rate_limits(definition, get_client_key(self.context))
+                with subscription_slot(self.context):
+                    await self._forward(operation, print_ast(document))
+            except GraphQLError as error:
+                await operation.send_initial_errors([error])
+                return
+
+            await operation.send_operation_message({'id': operation.id, 'type': 'complete'})
+
+        except Exception as error:
+            await self.handle_task_exception(error)
+
+            with suppress(Exception):
+                await operation.send_operation_message({'id': operation.id, 'type': 'complete'})
+
+            self.operations.pop(operation.id, None)
+            raise
+        finally:
+            self.completed_tasks.append(asyncio.current_task())
+
+    async def _forward(self, operation, query: str):
+        hub = get_subscription_hub()
+        group, queue = hub.join(self.schema, query, operation.variables, operation.operation_name)
+        try:
+            while not operation.completed:
+                kind, value = await queue.get()
+                if kind == 'next':
+                    await self.websocket.send_next(operation.id, value)
+                elif kind == 'error':
+                    await operation.send_initial_errors(value)
+                else:
+                    return
+        finally:
+            hub.leave(group, queue)
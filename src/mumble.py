@@ -1,125 +1,24 @@
 import asyncio
 import os
+import time
+import typing
 import Ice
-import MumbleServer
-from schema_types import ChannelChangeEvent, ChannelChangeType, TextMessageEvent, UserChangeEvent, UserChangeType
-from events import text_message_events, user_change_events, channel_change_events
+from resilience import ICE_INVOCATION_TIMEOUT, GuardedServer
+from slice_loader import detect_slice_module, get_slice_module, load_slice_module
 
-
-class MetaCallback(MumbleServer.MetaCallback):
-    def __init__(self, adapter):
-        self.adapter = adapter
-
-    def started(self, server, current=None):
-        """ Called when a server is started.
-
-        The server is up and running when this event is sent,
-        so all methods that need a running server will work.
-        """
-        server_cb = MumbleServer.ServerCallbackPrx.uncheckedCast(
-            self.adapter.addWithUUID(ServerCallback(server, current.adapter))
-        )
-
-        server.addCallback(server_cb)
-
-    def stopped(self, server, current=None):
-        """ Called when a server is stopped.
-
-        The server is already stopped when this event is sent,
-        so no methods that need a running server will work.
-        """
-        pass
-
-
-class ServerContextCallback(MumbleServer.ServerContextCallback):
-    """Callback for injecting additional content into the Murmur context menu"""
-
-    def __init__(self, server):
-        self.server = server
-
-    def contextAction(self, action, p, session, channel_id):
-        print(action, p)
-
-
-class ServerCallback(MumbleServer.ServerCallback):
-    """Callback for Murmur server events for a distinct server"""
-    _server: MumbleServer.ServerPrx
-    _adapter: Ice.ObjectAdapter
-
-    def __init__(self, server, adapter):
-        self._adapter = adapter
-        self._server = server
-
-        # self.contextR = Murmur.ServerContextCallbackPrx.uncheckedCast(
-        #     adapter.addWithUUID(ServerContextCallback(server))
-        # )
-
-    def userConnected(self, user, current=None):
-        user_change_events.publish(
-            UserChangeEvent(
-                UserChangeType.CONNECTED,
-                user,
-                self._server
-            )
-        )
-
-    def userDisconnected(self, user, current=None):
-        user_change_events.publish(
-            UserChangeEvent(
-                UserChangeType.DISCONNECTED,
-                user,
-                self._server
-            )
-        )
-
-    def userStateChanged(self, user, current=None):
-        user_change_events.publish(
-            UserChangeEvent(
-                UserChangeType.STATE_CHANGED,
-                user,
-                self._server
-            )
-        )
-
-    def userTextMessage(self, user, msg: MumbleServer.TextMessage, current=None):
-        text_message_events.publish(
-            TextMessageEvent(user, msg, self._server)
-        )
-
-    def channelCreated(self, channel, current=None):
-        channel_change_events.publish(
-            ChannelChangeEvent(
-                ChannelChangeType.CREATED,
-                channel,
-                self._server
-            )
-        )
-
-    def channelRemoved(self, channel, current=None):
-        channel_change_events.publish(
-            ChannelChangeEvent(
-                ChannelChangeType.REMOVED,
-                channel,
-                self._server
-            )
-        )
-
-    def channelStateChanged(self, channel, current=None):
-        channel_change_events.publish(
-            ChannelChangeEvent(
-                ChannelChangeType.STATE_CHANGED,
-                channel,
-                self._server
-            )
-        )
+if typing.TYPE_CHECKING:
+    import MumbleServer
 
 
 class MumbleClient:
     """
     Communicator to a Mumble servers using Ice.
     """
-    meta: MumbleServer.MetaPrx = None
-    servers: list[MumbleServer.ServerPrx] = []
+    meta: "MumbleServer.MetaPrx" = None
+    servers: list["MumbleServer.ServerPrx"] = []
+    servers_by_id: dict[int, "MumbleServer.ServerPrx"] = {}
+    guarded_servers: dict[int, "MumbleServer.ServerPrx"] = {}
+    booted_servers: set[int] = set()
     comm: Ice.Communicator = None
 
     def __init__(self, host: str = 'localhost', port: int = 6502, secret: str = None):
@@ -133,6 +32,7 @@ class MumbleClient:
             props = Ice.createProperties()
             props.setProperty('Ice.ImplicitContext', 'Shared')
             props.setProperty('Ice.Default.EncodingVersion', '1.0')
+            props.setProperty('Ice.Default.InvocationTimeout', str(ICE_INVOCATION_TIMEOUT or -1))
 
             idd = Ice.InitializationData()
             idd.properties = props
@@ -142,23 +42,47 @@ class MumbleClient:
                 self.comm.getImplicitContext().put('secret', self.secret)
 
             base = self.comm.stringToProxy(self.proxy)
-            self.meta = MumbleServer.MetaPrx.checkedCast(base)
+
+            # Only import the generated code for the Slice murmurd speaks
+            MumbleServer = load_slice_module(detect_slice_module(base))
+            self.meta = MumbleServer.MetaPrx.uncheckedCast(base)
             assert self.meta is not None
 
+            major, minor, patch, text = self.meta.getVersion()
+            print(f"Mumble server version {major}.{minor}.{patch} ({text})")
+
             self.servers = self.meta.getAllServers()
+            self.servers_by_id = {get_server_id(s): s for s in self.servers}
+            self.guarded_servers = {i: GuardedServer(s, i) for i, s in self.servers_by_id.items()}
+            self.booted_servers = {get_server_id(s) for s in self.meta.getBootedServers()}
             print(f"Found {len(self.servers)} servers")
 
-            self.bind_events()
+            self.start_events()
             return self.meta
 
-        except MumbleServer.InvalidSecretException as e:
-            print(f"Invalid secret: {e}")
+        except Ice.UserException as e:
+            # Slice exceptions are matched by ID as either module may be loaded
+            if e.ice_id().endswith('::InvalidSecretException'):
+                print(f"Invalid secret: {e}")
+            else:
+                print(f"Error connecting to Mumble server: {e}")
             return None
         except Exception as e:
             print(f"Error connecting to Mumble server: {e}")
             return None
 
+    def start_events(self):
+        """Bind Ice callbacks, or receive their events from the worker that does"""
+        from event_bus import event_bus, receive_message
+        if event_bus is None:
+            self.bind_events()
+        else:
+            event_bus.start(on_ingest=self.bind_events, on_message=receive_message)
+
     def bind_events(self):
+        from callbacks import MetaCallback, ServerCallback
+        MumbleServer = get_slice_module()
+
         adapter = self.comm.createObjectAdapterWithEndpoints(
             'Callback.Client', 'tcp')
 
@@ -171,12 +95,16 @@ class MumbleClient:
         self.meta.addCallback(meta_cb)
 
         # Attach event handlers to all already running server instances
-        for server in self.meta.getBootedServers():
+        for server in [self.servers_by_id[i] for i in self.booted_servers]:
             server_cb = MumbleServer.ServerCallbackPrx.uncheckedCast(
                 adapter.addWithUUID(ServerCallback(server, adapter))
             )
 
-            server.addCallback(server_cb)
+            try:
+                server.addCallback(server_cb)
+            except Ice.Exception as e:
+                # Don't let one hung server keep the others from connecting
+                print(f"Error attaching callback to server {get_server_id(server)}: {e}")
 
 
 _client = None
@@ -193,24 +121,55 @@ def get_mumble_client():
             port=os.environ.get('ICE_PORT') or 6502,
             secret=os.environ.get('ICE_SECRET')
         )
+        start = time.perf_counter()
         _client.connect()
-        print(f"Connected to Mumble server at {_client.host}:{_client.port}")
+        print(f"Connected to Mumble server at {_client.host}:{_client.port} in {(time.perf_counter() - start) * 1000:.1f}ms")
 
     return _client
 
 
-def get_mumble_servers() -> list[MumbleServer.ServerPrx]:
+def get_mumble_servers() -> list["MumbleServer.ServerPrx"]:
+    """Get all servers, with calls bounded by their timeouts and circuit breaker"""
     client = get_mumble_client()
-    return client.servers or []
+    return list(client.guarded_servers.values())
 
 
-def get_mumble_server(server_id: str) -> MumbleServer.ServerPrx | None:
+def get_mumble_server(server_id: str) -> "MumbleServer.ServerPrx | None":
+    """Get a server by ID, with calls bounded by its timeouts and circuit breaker"""
     client = get_mumble_client()
-    for server in client.servers:
-        if str(server.id()) == server_id:
-            return server
+    try:
+        return client.guarded_servers.get(int(server_id))
+    except ValueError:
+        return None
+
+
+def is_server_booted(server_id: int) -> bool:
+    """Check if a server is running, without calling murmurd.
+
+    Kept current by the meta callbacks as servers start and stop.
+    """
+    return server_id in get_mumble_client().booted_servers
+
+
+def set_server_booted(server_id: int, booted: bool):
+    client = get_mumble_client()
+    if booted:
+        client.booted_servers.add(server_id)
+    else:
+        client.booted_servers.discard(server_id)
+
+
+# Mapping between a server proxy identity -> server ID
+_server_ids: dict[str, int] = {}
+
+
+def get_server_id(server: "MumbleServer.ServerPrx") -> int:
+    """Get the ID of a server, only calling murmurd the first time"""
+    key = Ice.identityToString(server.ice_getIdentity())
+    if key not in _server_ids:
+        _server_ids[key] = server.id()
 
-    return None
+    return _server_ids[key]
 
 
 def mumble_heartbeat():
@@ -1,11 +1,161 @@
 
+import asyncio
+import html
+from functools import partial
+from string import Template
+from typing import Callable
+import Ice
 import strawberry
 from strawberry import ID
-from mumble import get_mumble_server
+from admission import call_ice
+from bans import BanInput, BanUpdateResult, update_bans
+from config import set_cached_config
+from mumble import get_mumble_server, get_mumble_servers, get_server_id, is_server_booted
+from registry import RegisteredUser, get_registered_user_index
+from resilience import MurmurUnavailableError
+from response_cache import response_cache
+from slice_loader import get_slice_module
+from snapshots import get_tree_snapshots, get_user_snapshot
 
 from schema_types import *
 
 
+@strawberry.type(description="Outcome of one item of a bulk mutation.")
+class BulkResult:
+    id: ID = strawberry.field(description="Session ID the item applied to.")
+    success: bool = strawberry.field(description="If the item was applied.")
+    error: str | None = strawberry.field(default=None, description="Why the item failed, if it did.")
+
+
+@strawberry.type(description="Delivery of a broadcast on one server.")
+class BroadcastServerResult:
+    server_id: ID = strawberry.field(description="The server the messages were sent on.")
+    sent: int = strawberry.field(description="Number of messages accepted by murmurd.")
+    failed: int = strawberry.field(description="Number of messages murmurd rejected.")
+    errors: list[str] = strawberry.field(description="Why messages failed, once per distinct reason.")
+
+
+@strawberry.type(description="Delivery stats of a broadcast.")
+class BroadcastResult:
+    sent: int = strawberry.field(description="Number of messages accepted by murmurd across all servers.")
+    failed: int = strawberry.field(description="Number of messages murmurd rejected across all servers.")
+    servers: list[BroadcastServerResult] = strawberry.field(description="Delivery per server.")
+
+
+def apply_user_state(user: "MumbleServer.User", input: UserStateInput) -> "MumbleServer.User":
+    """Apply the fields set in `input` to a user state struct"""
+    if input.mute is not None:
+        user.mute = input.mute
+
+    if input.deaf is not None:
+        user.deaf = input.deaf
+
+    if input.suppress is not None:
+        user.suppress = input.suppress
+
+    if input.channel is not None:
+        user.channel = int(input.channel)
+
+    return user
+
+
+async def gather_ice(server: "MumbleServer.ServerPrx", invocations: list[Callable[[], Ice.Future]]) -> list:
+    """Run async Ice invocations on a server concurrently, returning results or exceptions in order.
+
+    How many are in flight at once is capped per server by `call_ice`.
+    """
+    return await asyncio.gather(
+        *(call_ice(server, invoke) for invoke in invocations),
+        return_exceptions=True
+    )
+
+
+def describe_error(error: Exception) -> str:
+    # Slice exceptions stringify to a multiline dump of their members
+    if isinstance(error, Ice.Exception):
+        return type(error).__name__
+
+    return str(error)
+
+
+def to_bulk_results(ids: list, results: list) -> list[BulkResult]:
+    return [
+        BulkResult(id=i, success=False, error=describe_error(r))
+        if isinstance(r, Exception) else BulkResult(id=i, success=True)
+        for i, r in zip(ids, results)
+    ]
+
+
+async def set_user_states(server: "MumbleServer.ServerPrx", inputs: list[UserStateInput]) -> list[Exception | None]:
+    """Set the state of many sessions, returning the exception of each failed input.
+
+    setState writes the whole struct, so each change is applied on top of a
+    fresh getState, not a cached state that could undo changes made since.
+    Both steps are pipelined across the sessions.
+    """
+    states = await gather_ice(server, [partial(server.getStateAsync, int(i.id)) for i in inputs])
+    results = [s if isinstance(s, Exception) else None for s in states]
+    pending = [n for n, s in enumerate(states) if not isinstance(s, Exception)]
+
+    applied = await gather_ice(server, [
+        partial(server.setStateAsync, apply_user_state(states[n], inputs[n])) for n in pending
+    ])
+    for n, result in zip(pending, applied):
+        results[n] = result
+
+    return results
+
+
+# Variables a broadcast can use, filled in for every recipient
+BROADCAST_VARIABLES = {'name', 'session', 'userid', 'channel', 'server'}
+
+
+def plan_broadcast(
+    server: "MumbleServer.ServerPrx",
+    template: Template,
+    channel_ids: list[int],
+    session_ids: list[int],
+    tree: bool
+) -> list[Callable[[], Ice.Future]]:
+    """Get the Ice invocations that send a broadcast to one server.
+
+    Without `BROADCAST_VARIABLES` one message goes to each channel or session,
+    and to the root channel tree when neither is given. With them the text is
+    rendered for every recipient and sent to each session. Anything else that
+    looks like a variable, such as `$5` or `$other`, is sent as is.
+    """
+    if not BROADCAST_VARIABLES.intersection(template.get_identifiers()):
+        if not channel_ids and not session_ids:
+            return [partial(server.sendMessageChannelAsync, 0, True, template.template)]
+
+        return [
+            partial(server.sendMessageChannelAsync, c, tree, template.template) for c in channel_ids
+        ] + [
+            partial(server.sendMessageAsync, s, template.template) for s in session_ids
+        ]
+
+    channels, users = get_tree_snapshots(server)
+    recipients = users.values()
+    if channel_ids or session_ids:
+        in_channels = channels.descendants('parent', channel_ids) if tree else set(channel_ids)
+        sessions = set(session_ids)
+        recipients = [u for u in recipients if u.channel in in_channels or u.session in sessions]
+
+    server_id = get_server_id(server)
+    channel_names = {c.id: html.escape(c.name) for c in channels.values()}
+
+    return [
+        partial(server.sendMessageAsync, u.session, template.safe_substitute(
+            name=html.escape(u.name),
+            session=u.session,
+            userid=u.userid,
+            channel=channel_names.get(u.channel, ''),
+            server=server_id
+        ))
+        for u in recipients
+    ]
+
+
 @strawberry.type
 class Mutation:
     @strawberry.mutation(description="Update the welcome message for a server.")
@@ -15,6 +165,53 @@ class Mutation:
             raise ValueError(f"Server with ID {server_id} not found")
 
         server.setConf("welcometext", text)
+        set_cached_config(get_server_id(server), "welcometext", text)
+        response_cache.invalidate_server(get_server_id(server))
+        return True
+
+    @strawberry.mutation(description="Add and remove bans of a server. The new ban list is computed "
+                         "from the cached one and sent to murmurd in one call.")
+    def update_bans(
+        self,
+        server_id: ID,
+        add: list[BanInput] | None = None,
+        remove: list[str] | None = None
+    ) -> BanUpdateResult:
+        server = get_mumble_server(server_id)
+        if not server:
+            raise ValueError(f"Server with ID {server_id} not found")
+
+        result = update_bans(server, add or [], remove or [])
+        response_cache.invalidate_server(get_server_id(server))
+        return result
+
+    @strawberry.mutation(description="Register a user account.")
+    def register_user(self, server_id: ID, name: str, password: str | None = None, email: str | None = None) -> RegisteredUser:
+        server = get_mumble_server(server_id)
+        if not server:
+            raise ValueError(f"Server with ID {server_id} not found")
+
+        UserInfo = get_slice_module().UserInfo
+        info = {UserInfo.UserName: name}
+        if password is not None:
+            info[UserInfo.UserPassword] = password
+        if email is not None:
+            info[UserInfo.UserEmail] = email
+
+        user_id = server.registerUser(info)
+        get_registered_user_index(server).upsert(user_id, name)
+        response_cache.invalidate_server(get_server_id(server))
+        return RegisteredUser(id=user_id, name=name)
+
+    @strawberry.mutation(description="Remove a user account.")
+    def unregister_user(self, server_id: ID, user_id: ID) -> bool:
+        server = get_mumble_server(server_id)
+        if not server:
+            raise ValueError(f"Server with ID {server_id} not found")
+
+        server.unregisterUser(int(user_id))
+        get_registered_user_index(server).remove(int(user_id))
+        response_cache.invalidate_server(get_server_id(server))
         return True
 
     @strawberry.mutation(description="Send text message to a single user.")
@@ -35,24 +232,106 @@ class Mutation:
         server.sendMessageChannel(int(channel_id), tree, text)
         return True
 
+    @strawberry.mutation(description="Send a text message to many servers, channels or sessions at once. "
+                         "The text may use `$name`, `$session`, `$userid`, `$channel` and `$server`, "
+                         "which are filled in per recipient.")
+    async def broadcast_message(
+        self,
+        text: str,
+        server_ids: list[ID] | None = None,
+        channel_ids: list[ID] | None = None,
+        session_ids: list[ID] | None = None,
+        tree: bool = True
+    ) -> BroadcastResult:
+        if server_ids is None:
+            # Stopped servers have nobody to send to
+            servers = [s for s in get_mumble_servers() if is_server_booted(get_server_id(s))]
+        else:
+            servers = [get_mumble_server(s) for s in server_ids]
+            for server_id, server in zip(server_ids, servers):
+                if not server:
+                    raise ValueError(f"Server with ID {server_id} not found")
+
+        template = Template(text)
+        channel_ids = [int(c) for c in channel_ids or []]
+        session_ids = [int(s) for s in session_ids or []]
+
+        planned: list[tuple["MumbleServer.ServerPrx", list[Callable[[], Ice.Future]], list[str]]] = []
+        for server in servers:
+            try:
+                planned.append((server, plan_broadcast(server, template, channel_ids, session_ids, tree), []))
+            except (Ice.Exception, MurmurUnavailableError) as e:
+                planned.append((server, [], [describe_error(e)]))
+
+        # All servers are sent to concurrently
+        results = await asyncio.gather(*(
+            gather_ice(server, invocations) for server, invocations, _ in planned
+        ))
+
+        servers_results = []
+        for (server, _, errors), server_results in zip(planned, results):
+            failures = [r for r in server_results if isinstance(r, Exception)]
+            for failure in failures:
+                if describe_error(failure) not in errors:
+                    errors.append(describe_error(failure))
+
+            servers_results.append(BroadcastServerResult(
+                server_id=get_server_id(server),
+                sent=len(server_results) - len(failures),
+                failed=len(failures),
+                errors=errors
+            ))
+
+        return BroadcastResult(
+            sent=sum(s.sent for s in servers_results),
+            failed=sum(s.failed for s in servers_results),
+            servers=servers_results
+        )
+
     @strawberry.mutation(description="Set user state. You can use this to move, mute and deafen users.")
-    def user_state(self, server_id: ID, input: UserStateInput) -> bool:
+    async def user_state(self, server_id: ID, input: UserStateInput) -> bool:
         server = get_mumble_server(server_id)
         if not server:
             raise ValueError(f"Server with ID {server_id} not found")
 
-        user = server.getState(int(input.id))
-        if input.mute is not None:
-            user.mute = input.mute
+        error, = await set_user_states(server, [input])
+        if error is not None:
+            raise error
 
-        if input.deaf is not None:
-            user.deaf = input.deaf
+        return True
 
-        if input.suppress is not None:
-            user.suppress = input.suppress
+    @strawberry.mutation(description="Set the state of many users at once. Calls to murmurd are pipelined.")
+    async def bulk_user_state(self, server_id: ID, inputs: list[UserStateInput]) -> list[BulkResult]:
+        server = get_mumble_server(server_id)
+        if not server:
+            raise ValueError(f"Server with ID {server_id} not found")
 
-        if input.channel is not None:
-            user.channel = int(input.channel)
+        return to_bulk_results([i.id for i in inputs], await set_user_states(server, inputs))
 
-        server.setState(user)
-        return True
+    @strawberry.mutation(description="Move every user in a channel to another channel.")
+    async def move_channel_users(self, server_id: ID, channel_id: ID, target_channel_id: ID) -> list[BulkResult]:
+        server = get_mumble_server(server_id)
+        if not server:
+            raise ValueError(f"Server with ID {server_id} not found")
+
+        users = get_user_snapshot(server).lookup('channel', int(channel_id))
+        inputs = [UserStateInput(id=u.session, channel=target_channel_id) for u in users]
+        return to_bulk_results([i.id for i in inputs], await set_user_states(server, inputs))
+
+    @strawberry.mutation(description="Send a text message to many users at once. Calls to murmurd are pipelined.")
+    async def bulk_send_message(self, server_id: ID, session_ids: list[ID], text: str) -> list[BulkResult]:
+        server = get_mumble_server(server_id)
+        if not server:
+            raise ValueError(f"Server with ID {server_id} not found")
+
+        results = await gather_ice(server, [partial(server.sendMessageAsync, int(s), text) for s in session_ids])
+        return to_bulk_results(session_ids, results)
+
+    @strawberry.mutation(description="Kick many users at once. Calls to murmurd are pipelined.")
+    async def bulk_kick_users(self, server_id: ID, session_ids: list[ID], reason: str = "") -> list[BulkResult]:
+        server = get_mumble_server(server_id)
+        if not server:
+            raise ValueError(f"Server with ID {server_id} not found")
+
+        results = await gather_ice(server, [partial(server.kickUserAsync, int(s), reason) for s in session_ids])
+        return to_bulk_results(session_ids, results)
@@ -0,0 +1,172 @@
+import asyncio
+import os
+import time
+import weakref
+from enum import Enum
+from functools import partial
+from typing import TYPE_CHECKING
+
+import strawberry
+from strawberry.dataloader import DataLoader
+
+from admission import call_ice
+from mumble import get_server_id
+
+if TYPE_CHECKING:
+    import MumbleServer
+
+# Seconds effective permissions are cached. Events drop them sooner when users
+# or channels change, this bounds how long ACL edits take to show up.
+PERMISSION_CACHE_TTL = float(os.environ.get('PERMISSION_CACHE_TTL') or 60)
+
+
+@strawberry.enum(description="A permission a user can have in a channel.")
+class Permission(Enum):
+    WRITE = 0x01
+    TRAVERSE = 0x02
+    ENTER = 0x04
+    SPEAK = 0x08
+    MUTE_DEAFEN = 0x10
+    MOVE = 0x20
+    MAKE_CHANNEL = 0x40
+    LINK_CHANNEL = 0x80
+    WHISPER = 0x100
+    TEXT_MESSAGE = 0x200
+    MAKE_TEMP_CHANNEL = 0x400
+    LISTEN = 0x800
+    KICK = 0x10000
+    BAN = 0x20000
+    REGISTER = 0x40000
+    REGISTER_SELF = 0x80000
+    RESET_USER_CONTENT = 0x100000
+
+
+def decode_permissions(bits: int) -> list[Permission]:
+    return [p for p in Permission if bits & p.value]
+
+
+@strawberry.type(description="Effective permissions of a user in a channel.")
+class ChannelPermissions:
+    session_id: strawberry.ID = strawberry.field(description="Session ID of the user.")
+    channel_id: strawberry.ID = strawberry.field(description="The channel the permissions apply in.")
+    permissions: list[Permission] = strawberry.field(description="Permissions the user has in the channel.")
+
+
+class PermissionCache:
+    """Effective permissions of the sessions of one server, per channel"""
+
+    def __init__(self):
+        self.created = time.monotonic()
+        # Mapping between a session -> {channel_id: permission bits}
+        self.sessions: dict[int, dict[int, int]] = {}
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() - self.created > PERMISSION_CACHE_TTL
+
+
+# Mapping between a server_id -> its cached permissions
+permission_caches: dict[int, PermissionCache] = {}
+
+
+def get_permission_cache(server_id: int) -> PermissionCache:
+    cache = permission_caches.get(server_id)
+    if cache is None or cache.expired:
+        cache = permission_caches[server_id] = PermissionCache()
+
+    return cache
+
+
+async def fetch_effective_permissions(
+    server: "MumbleServer.ServerPrx",
+    pairs: list[tuple[int, int]]
+) -> dict[tuple[int, int], int | Exception]:
+    """Get the permission bits of (session, channel_id) pairs, or the exception murmurd raised for them.
+
+    Missing pairs are fetched concurrently, as many at once as `call_ice` allows.
+    """
+    cache = get_permission_cache(get_server_id(server))
+    # Results are stored in the dict of the session they were fetched for,
+    # so a session dropped by an event in the meantime stays dropped
+    session_channels = {s: cache.sessions.setdefault(s, {}) for s, _ in pairs}
+
+    missing = list(dict.fromkeys((s, c) for s, c in pairs if c not in session_channels[s]))
+    results = await asyncio.gather(
+        *(call_ice(server, partial(server.effectivePermissionsAsync, s, c)) for s, c in missing),
+        return_exceptions=True
+    )
+
+    permissions: dict[tuple[int, int], int | Exception] = {}
+    for (session, channel_id), result in zip(missing, results):
+        if isinstance(result, Exception):
+            permissions[(session, channel_id)] = result
+        else:
+            session_channels[session][channel_id] = result
+
+    for session, channel_id in pairs:
+        if channel_id in session_channels[session]:
+            permissions[(session, channel_id)] = session_channels[session][channel_id]
+
+    return permissions
+
+
+async def fill_effective_permissions(
+    server: "MumbleServer.ServerPrx",
+    sessions: list[int],
+    channel_ids: list[int]
+) -> dict[tuple[int, int], int]:
+    """Get the permission bits of every session in every channel.
+
+    Pairs murmurd rejects (such as sessions that just left) are left out.
+    """
+    permissions = await fetch_effective_permissions(server, [(s, c) for s in sessions for c in channel_ids])
+    return {pair: bits for pair, bits in permissions.items() if not isinstance(bits, Exception)}
+
+
+async def _load_effective_permissions(keys: list[tuple["MumbleServer.ServerPrx", int, int]]) -> list[int | Exception]:
+    servers: dict["MumbleServer.ServerPrx", list[tuple[int, int]]] = {}
+    for server, session, channel_id in keys:
+        servers.setdefault(server, []).append((session, channel_id))
+
+    fetched = await asyncio.gather(*(fetch_effective_permissions(s, pairs) for s, pairs in servers.items()))
+    results = dict(zip(servers, fetched))
+    return [results[server][(session, channel_id)] for server, session, channel_id in keys]
+
+
+# Mapping between an event loop -> loader batching the permission lookups made in one tick.
+# Results are cached in `permission_caches`, not by the loader.
+_permission_loaders: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, DataLoader] = weakref.WeakKeyDictionary()
+
+
+async def load_effective_permissions(server: "MumbleServer.ServerPrx", session: int, channel_id: int) -> int:
+    """Get the permission bits of a session in a channel.
+
+    Lookups made by resolvers of the same list (such as every user of a channel)
+    are fetched together, with one `fetch_effective_permissions` call per server.
+    """
+    loop = asyncio.get_running_loop()
+    loader = _permission_loaders.get(loop)
+    if loader is None:
+        loader = _permission_loaders[loop] = DataLoader(_load_effective_permissions, cache=False, loop=loop)
+
+    return await loader.load((server, session, channel_id))
+
+
+def invalidate_user_permissions(event):
+    """Event listener dropping the cached permissions of a user that changed, such as by moving channel"""
+    cache = permission_caches.get(get_server_id(event._server))
+    if cache is not None:
+        cache.sessions.pop(event._user.session, None)
+
+
+def invalidate_channel_permissions(event):
+    """Event listener dropping the cached permissions of a server when a channel changes.
+
+    ACLs are inherited through the channel tree, so one channel can affect any other.
+    """
+    permission_caches.pop(get_server_id(event._server), None)
+
+
+def drop_permissions(server_id: int):
+    """Forget permissions of a server, such as when it stops"""
+    permission_caches.pop(server_id, None)
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Any
+
+from graphql import GraphQLError
+from strawberry.fastapi import GraphQLRouter
+from strawberry.types import ExecutionResult
+
+from fanout import FanOutGraphQLTransportWSHandler
+from ws_encoding import EncodedWebSocketAdapter
+
+
+class PersistedQueryError(Exception):
+    """Raised when a persisted query cannot be resolved to a document"""
+
+    def __init__(self, message: str, code: str):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+class PersistedQueryStore:
+    """LRU of query documents keyed by their SHA-256 hash.
+
+    Implements Apollo's automatic persisted queries: clients send only
+    the hash, and fall back to sending the full document once when the
+    hash is unknown. If an allowlist is loaded, only the documents in it
+    can be executed and nothing new is ever registered.
+    """
+
+    def __init__(self, maxsize: int = 256, allowlist: dict[str, str] | None = None):
+        self.maxsize = maxsize
+        self.allowlist = allowlist
+        self._queries: OrderedDict[str, str] = OrderedDict()
+
+    def get(self, sha256_hash: str) -> str | None:
+        if self.allowlist is not None:
+            return self.allowlist.get(sha256_hash)
+
+        query = self._queries.get(sha256_hash)
+        if query is not None:
+            self._queries.move_to_end(sha256_hash)
+
+        return query
+
+    def add(self, sha256_hash: str, query: str):
+        self._queries[sha256_hash] = query
+        self._queries.move_to_end(sha256_hash)
+
+        if len(self._queries) > self.maxsize:
+            self._queries.popitem(last=False)
+
+    def resolve(self, data: dict[str, Any]) -> dict[str, Any]:
+        """Fill in the `query` of a GraphQL request body from the store"""
+        extensions = data.get('extensions')
+        if not isinstance(extensions, dict) or 'persistedQuery' not in extensions:
+            if self.allowlist is not None and data.get('query'):
+                if hash_query(data['query']) not in self.allowlist:
+                    raise PersistedQueryError(
+                        'PersistedQueryNotAllowed', 'PERSISTED_QUERY_NOT_ALLOWED')
+            return data
+
+        sha256_hash = extensions['persistedQuery'].get('sha256Hash')
+        if not sha256_hash:
+            raise PersistedQueryError(
+                'PersistedQueryNotSupported', 'PERSISTED_QUERY_NOT_SUPPORTED')
+
+        query = data.get('query')
+        if not query:
+            query = self.get(sha256_hash)
+            if query is None:
+                if self.allowlist is not None:
+                    raise PersistedQueryError(
+                        'PersistedQueryNotAllowed', 'PERSISTED_QUERY_NOT_ALLOWED')
+                raise PersistedQueryError(
+                    'PersistedQueryNotFound', 'PERSISTED_QUERY_NOT_FOUND')
+
+            return {**data, 'query': query}
+
+        if hash_query(query) != sha256_hash:
+            raise PersistedQueryError(
+                'provided sha does not match query', 'INTERNAL_SERVER_ERROR')
+
+        if self.allowlist is not None:
+            if sha256_hash not in self.allowlist:
+                raise PersistedQueryError(
+                    'PersistedQueryNotAllowed', 'PERSISTED_QUERY_NOT_ALLOWED')
+        else:
+            self.add(sha256_hash, query)
+
+        return data
+
+
+def hash_query(query: str) -> str:
+    return hashlib.sha256(query.encode('utf-8')).hexdigest()
+
+
+def load_allowlist(path: str) -> dict[str, str]:
+    """Load a JSON file of either `{hash: query}` or a list of queries"""
+    with open(path) as f:
+        documents = json.load(f)
+
+    if isinstance(documents, list):
+        return {hash_query(q): q for q in documents}
+
+    return documents
+
+
+class PersistedQueryRouter(GraphQLRouter):
+    """GraphQLRouter that resolves persisted query hashes before execution"""
+
+    websocket_adapter_class = EncodedWebSocketAdapter
+    graphql_transport_ws_handler_class = FanOutGraphQLTransportWSHandler
+
+    def __init__(self, schema, store: PersistedQueryStore, **kwargs):
+        super().__init__(schema, **kwargs)
+        self.store = store
+
+    def parse_json(self, data: str | bytes) -> Any:
+        parsed = super().parse_json(data)
+        if isinstance(parsed, dict):
+            return self.store.resolve(parsed)
+
+        return parsed
+
+    def parse_query_params(self, params) -> dict[str, Any]:
+        # Parsed here rather than through `parse_json` so variables
+        # are never mistaken for a request body.
+        params = dict(params)
+        for key in ('variables', 'extensions'):
+            if params.get(key):
+                params[key] = super().parse_json(params[key])
+
+        return self.store.resolve(params)
+
+    async def execute_operation(self, request, context, root_value):
+        try:
+            return await super().execute_operation(request, context, root_value)
+        except PersistedQueryError as e:
+            return ExecutionResult(
+                data=None,
+                errors=[GraphQLError(e.message, extensions={'code': e.code})]
+            )
+
+
+_allowlist_path = os.environ.get('PERSISTED_QUERIES_ALLOWLIST')
+
+persisted_query_store = PersistedQueryStore(
+    maxsize=int(os.environ.get('PERSISTED_QUERIES_CACHE_SIZE') or 256),
+    allowlist=load_allowlist(_allowlist_path) if _allowlist_path else None
+)
@@ -2,6 +2,7 @@
 import strawberry
 from strawberry import ID
 from mumble import get_mumble_servers
+from query_cost import observe_list_size
 from schema_types import Server
 
 
@@ -9,4 +10,6 @@ from schema_types import Server
 class Query:
     @strawberry.field(description="Get a list of all servers.")
     def servers(self) -> list[Server]:
-        return [Server(s) for s in get_mumble_servers()]
+        servers = [Server(s) for s in get_mumble_servers()]
+        observe_list_size('Query.servers', None, len(servers))
+        return servers
@@ -0,0 +1,181 @@
+import os
+
+from graphql import (
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLList,
+    GraphQLNonNull,
+    GraphQLObjectType,
+    InlineFragmentNode,
+    OperationType,
+    SelectionSetNode,
+)
+from graphql.execution import ExecutionResult
+from graphql.utilities import value_from_ast_untyped
+from strawberry.extensions import SchemaExtension
+
+from utils import get_operation
+
+QUERY_COST_LIMIT = int(os.environ.get('QUERY_COST_LIMIT') or 0)
+
+# Cost of resolving a field once, roughly the number of Ice calls it makes.
+# Fields not listed here are plain attribute reads and cost nothing.
+FIELD_COSTS: dict[str, int] = {
+    'Server.channels': 1,
+    'Server.users': 1,
+    'Server.channelsConnection': 1,
+    'Server.usersConnection': 1,
+    'Server.tree': 1,
+    'Server.welcomeMessage': 1,
+    'Server.config': 1,
+    'Server.log': 1,
+    'Server.bans': 1,
+    'Server.isBanned': 1,
+    'Server.permissions': 1,
+    'Server.registeredUsers': 1,
+    'Server.registeredUsersById': 1,
+    'Server.registeredUsersByName': 1,
+    'User.effectivePermissions': 1,
+    'User.texture': 2,
+}
+
+# List size assumed for a list field that hasn't been resolved yet
+DEFAULT_LIST_SIZE = 10
+
+# Mapping between a field coordinate -> {owner: last resolved list size}
+_list_sizes: dict[str, dict[int | None, int]] = {}
+
+
+def observe_list_size(coordinate: str, owner: int | None, size: int):
+    """Record the size of a list returned by a resolver.
+
+    `owner` distinguishes lists of the same field on different parents
+    (such as the users of each server), the largest is used as estimate.
+    """
+    _list_sizes.setdefault(coordinate, {})[owner] = size
+
+
+def estimate_list_size(coordinate: str) -> int:
+    sizes = _list_sizes.get(coordinate)
+    if not sizes:
+        return DEFAULT_LIST_SIZE
+
+    return max(sizes.values())
+
+
+def _unwrap(type_):
+    """Strip NonNull/List wrappers, returning the named type and if it was a list"""
+    is_list = False
+    while isinstance(type_, (GraphQLNonNull, GraphQLList)):
+        if isinstance(type_, GraphQLList):
+            is_list = True
+        type_ = type_.of_type
+
+    return type_, is_list
+
+
+def _page_size(field: FieldNode, variables: dict) -> int | None:
+    """Get the `first` argument of a paginated field, if given"""
+    for argument in field.arguments:
+        if argument.name.value == 'first':
+            value = value_from_ast_untyped(argument.value, variables)
+            return value if isinstance(value, int) else None
+
+    return None
+
+
+def selection_cost(
+    parent: GraphQLObjectType,
+    selection_set: SelectionSetNode,
+    fragments: dict,
+    variables: dict,
+    multiplier: int = 1,
+    page_size: int | None = None
+) -> int:
+    """Estimate the cost of resolving a selection set `multiplier` times.
+
+    `page_size` caps the size of lists under a paginated field.
+    """
+    cost = 0
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            name = selection.name.value
+            field = parent.fields.get(name)
+            if field is None:
+                # Introspection and __typename
+                continue
+
+            coordinate = f'{parent.name}.{name}'
+            cost += FIELD_COSTS.get(coordinate, 0) * multiplier
+
+            if selection.selection_set:
+                child, is_list = _unwrap(field.type)
+                child_multiplier = multiplier
+                if is_list:
+                    size = estimate_list_size(coordinate)
+                    child_multiplier *= min(size, page_size) if page_size is not None else size
+
+                child_page_size = _page_size(selection, variables)
+                if isinstance(child, GraphQLObjectType):
+                    cost += selection_cost(
+                        child, selection.selection_set, fragments, variables,
+                        child_multiplier, child_page_size
+                    )
+
+        elif isinstance(selection, FragmentSpreadNode):
+            fragment = fragments.get(selection.name.value)
+            if fragment is not None:
+                cost += selection_cost(
+                    parent, fragment.selection_set, fragments, variables, multiplier, page_size)
+
+        elif isinstance(selection, InlineFragmentNode):
+            cost += selection_cost(
+                parent, selection.selection_set, fragments, variables, multiplier, page_size)
+
+    return cost
+
+
+class QueryCostExtension(SchemaExtension):
+    """Reject operations estimated to cost more than `QUERY_COST_LIMIT`.
+
+    The estimate is reported in the `cost` response extension either way.
+    """
+
+    def __init__(self, *, execution_context=None):
+        self.cost = None
+
+    def on_execute(self):
+        context = self.execution_context
+        document = context.graphql_document
+
+        operation = get_operation(document, context.operation_name)
+
+        # Subscriptions are paid for per event, not up front
+        if operation is not None and operation.operation != OperationType.SUBSCRIPTION:
+            fragments = {
+                d.name.value: d for d in document.definitions
+                if isinstance(d, FragmentDefinitionNode)
+            }
+            root = context.schema._schema.get_root_type(operation.operation)
+            self.cost = selection_cost(
+                root, operation.selection_set, fragments, context.variables or {})
+
+            if QUERY_COST_LIMIT and self.cost > QUERY_COST_LIMIT:
+                context.result = ExecutionResult(
+                    data=None,
+                    errors=[GraphQLError(
+                        f"Query cost {self.cost} exceeds the limit of {QUERY_COST_LIMIT}",
+                        extensions={'code': 'QUERY_TOO_EXPENSIVE'}
+                    )]
+                )
+
+        yield
+
+    def get_results(self):
+        if self.cost is None:
+            return {}
+
+        return {'cost': {'estimated': self.cost, 'limit': QUERY_COST_LIMIT or None}}
+
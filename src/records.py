@@ -0,0 +1,94 @@
+import functools
+import inspect
+import sys
+from typing import TYPE_CHECKING, Any, Callable
+
+from slice_loader import get_slice_module
+
+if TYPE_CHECKING:
+    import MumbleServer
+
+
+class Record:
+    """Immutable record of the fields of an Ice struct the API uses.
+
+    Snapshots and queued events hold on to many of these, so they
+    use `__slots__` and share repeated strings instead of keeping
+    the generated structs around.
+    """
+
+    __slots__ = ()
+
+    # Fields holding strings many records have in common
+    interned: tuple[str, ...] = ()
+
+    # Mapping between a field -> function converting it to a compact, immutable type
+    converters: dict[str, Callable[[Any], Any]] = {}
+
+    # Mapping between a field missing from older Slice modules -> value to use instead
+    defaults: dict[str, Any] = {}
+
+    def __init__(self, **fields: Any):
+        for name in self.__slots__:
+            value = fields[name]
+            if name in self.interned:
+                value = sys.intern(value)
+            elif name in self.converters:
+                value = self.converters[name](value)
+
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    @classmethod
+    def from_ice(cls, struct):
+        return cls(**{
+            name: getattr(struct, name, cls.defaults[name]) if name in cls.defaults else getattr(struct, name)
+            for name in cls.__slots__
+        })
+
+    def as_dict(self) -> dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other):
+        return type(other) is type(self) and self.as_dict() == other.as_dict()
+
+    __hash__ = None
+
+
+class UserRecord(Record):
+    __slots__ = (
+        'session', 'userid', 'name', 'comment', 'channel',
+        'mute', 'deaf', 'suppress', 'prioritySpeaker', 'selfMute', 'selfDeaf', 'recording',
+        'onlinesecs', 'idlesecs', 'bytespersec',
+        'os', 'osversion', 'version', 'version2', 'release', 'address',
+    )
+    interned = ('name', 'os', 'osversion', 'release')
+    converters = {'address': bytes}
+    # Only the MumbleServer Slice (murmurd 1.5+) has `version2`
+    defaults = {'version2': 0}
+
+    def to_ice(self) -> "MumbleServer.User":
+        """Get a new, mutable user struct to send back to murmurd, such as with setState"""
+        User = get_slice_module().User
+        fields = get_struct_fields(User)
+        return User(**{name: value for name, value in self.as_dict().items() if name in fields})
+
+    def __repr__(self):
+        return f"UserRecord(session={self.session}, name={self.name!r}, channel={self.channel})"
+
+
+class ChannelRecord(Record):
+    __slots__ = ('id', 'name', 'parent', 'links', 'description', 'temporary', 'position')
+    interned = ('name',)
+    converters = {'links': tuple}
+
+    def __repr__(self):
+        return f"ChannelRecord(id={self.id}, name={self.name!r}, parent={self.parent})"
+
+
+@functools.cache
+def get_struct_fields(struct_class: type) -> frozenset[str]:
+    """Get the fields a generated struct accepts, which differ between Slice modules"""
+    return frozenset(inspect.signature(struct_class).parameters)
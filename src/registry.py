@@ -0,0 +1,146 @@
+import bisect
+import os
+import threading
+import time
+from typing import TYPE_CHECKING
+
+import strawberry
+
+from mumble import get_server_id
+
+if TYPE_CHECKING:
+    import MumbleServer
+
+# Seconds before the registered users of a server are fetched again in full.
+# Registrations made through the API or seen in events update it in between.
+REGISTERED_USERS_TTL = float(os.environ.get('REGISTERED_USERS_TTL') or 300)
+
+
+@strawberry.type(description="A registered user account.")
+class RegisteredUser:
+    id: strawberry.ID = strawberry.field(description="Registered User ID. Matches `User.userId`.")
+    name: str = strawberry.field(description="The name of the account.")
+
+
+class RegisteredUserIndex:
+    """Names of the registered users of a server, sorted case-insensitively for prefix search"""
+
+    def __init__(self, names: dict[int, str]):
+        self.created = time.monotonic()
+        self.names: dict[int, str] = {}
+        # Mapping between a lowercase name -> user ID
+        self.ids: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        for user_id, name in names.items():
+            self.names[user_id] = name
+            self.ids[name.lower()] = user_id
+
+        # (lowercase name, user ID) of every user, sorted
+        self.keys: list[tuple[str, int]] = sorted((name.lower(), user_id) for user_id, name in self.names.items())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() - self.created > REGISTERED_USERS_TTL
+
+    def upsert(self, user_id: int, name: str):
+        with self._lock:
+            if self.names.get(user_id) == name:
+                return
+
+            self._remove(user_id)
+            self.names[user_id] = name
+            self.ids[name.lower()] = user_id
+            bisect.insort(self.keys, (name.lower(), user_id))
+
+    def remove(self, user_id: int):
+        with self._lock:
+            self._remove(user_id)
+
+    def _remove(self, user_id: int):
+        name = self.names.pop(user_id, None)
+        if name is None:
+            return
+
+        if self.ids.get(name.lower()) == user_id:
+            del self.ids[name.lower()]
+
+        key = (name.lower(), user_id)
+        n = bisect.bisect_left(self.keys, key)
+        if n < len(self.keys) and self.keys[n] == key:
+            del self.keys[n]
+
+    def page(self, prefix: str, first: int, after: int | None) -> tuple[list[tuple[int, str]], bool, int]:
+        """Get up to `first` users whose name starts with `prefix`, ordered by name, after the user `after`.
+
+        Returns the page of (user ID, name), if there are more matches, and the number of matches.
+        """
+        if first < 0:
+            raise ValueError("first must not be negative")
+
+        prefix = prefix.lower()
+        with self._lock:
+            start = bisect.bisect_left(self.keys, (prefix,))
+            end = bisect.bisect_left(self.keys, (prefix + '\U0010ffff',))
+
+            position = start
+            if after is not None:
+                name = self.names.get(after)
+                if name is None:
+                    raise ValueError("Cursor refers to a user that is no longer registered")
+
+                position = max(start, bisect.bisect_right(self.keys, (name.lower(), after)))
+
+            keys = self.keys[position:min(position + first, end)]
+            return [(user_id, self.names[user_id]) for _, user_id in keys], position + first < end, end - start
+
+
+# Mapping between a server_id -> index of its registered users
+registered_user_indexes: dict[int, RegisteredUserIndex] = {}
+
+
+def get_registered_user_index(server: "MumbleServer.ServerPrx") -> RegisteredUserIndex:
+    """Get the registered users of a server, fetching all of them once expired"""
+    server_id = get_server_id(server)
+    index = registered_user_indexes.get(server_id)
+    if index is None or index.expired:
+        index = registered_user_indexes[server_id] = RegisteredUserIndex(server.getRegisteredUsers(''))
+
+    return index
+
+
+def get_user_names(server: "MumbleServer.ServerPrx", user_ids: list[int]) -> dict[int, str]:
+    """Get the names of registered users, with one getUserNames call for any not in the index"""
+    index = get_registered_user_index(server)
+    names = {i: index.names[i] for i in user_ids if i in index.names}
+
+    missing = [i for i in user_ids if i not in names]
+    if missing:
+        for user_id, name in server.getUserNames(missing).items():
+            if name:
+                index.upsert(user_id, name)
+                names[user_id] = name
+
+    return names
+
+
+def get_user_ids(server: "MumbleServer.ServerPrx", names: list[str]) -> dict[str, int]:
+    """Get the IDs of registered users by name, with one getUserIds call for any not in the index"""
+    index = get_registered_user_index(server)
+    ids = {n: index.ids[n.lower()] for n in names if n.lower() in index.ids}
+
+    missing = [n for n in names if n not in ids]
+    if missing:
+        for name, user_id in server.getUserIds(missing).items():
+            if user_id >= 0:
+                index.upsert(user_id, name)
+                ids[name] = user_id
+
+    return ids
+
+
+def apply_registration_event(event):
+    """Event listener adding users that registered (or were renamed) while connected"""
+    index = registered_user_indexes.get(get_server_id(event._server))
+    if index is not None and event._user.userid >= 0:
+        index.upsert(event._user.userid, event._user.name)
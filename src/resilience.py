@@ -0,0 +1,185 @@
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+import Ice
+from strawberry.extensions import SchemaExtension
+from strawberry.types.graphql import OperationType
+
+# Milliseconds a single Ice call may take, `0` waits forever
+ICE_INVOCATION_TIMEOUT = int(os.environ.get('ICE_INVOCATION_TIMEOUT') or 5000)
+
+# Seconds a query or mutation may spend calling murmurd in total, `0` disables the deadline
+REQUEST_TIMEOUT = float(os.environ.get('REQUEST_TIMEOUT') or 10)
+
+# Consecutive failed calls before a server's circuit opens, and seconds before it is tried again
+CIRCUIT_BREAKER_THRESHOLD = int(os.environ.get('CIRCUIT_BREAKER_THRESHOLD') or 3)
+CIRCUIT_BREAKER_COOLDOWN = float(os.environ.get('CIRCUIT_BREAKER_COOLDOWN') or 30)
+
+# Errors that mean a server is unreachable or hung, rather than refusing a request
+SERVER_FAILURES = (Ice.TimeoutException, Ice.SocketException)
+
+# Monotonic time the executing operation must finish by
+_deadline: ContextVar[float | None] = ContextVar('request_deadline', default=None)
+
+
+class MurmurUnavailableError(Exception):
+    """Raised instead of calling murmurd when the call can't succeed in time"""
+
+
+class DeadlineExceededError(MurmurUnavailableError):
+    """Raised instead of calling murmurd once the request deadline passed"""
+
+
+class ServerUnavailableError(MurmurUnavailableError):
+    """Raised instead of calling a server while its circuit is open"""
+
+
+def get_invocation_timeout() -> int:
+    """Get the Ice invocation timeout in milliseconds, bounded by the request deadline"""
+    timeout = ICE_INVOCATION_TIMEOUT or -1
+
+    deadline = _deadline.get()
+    if deadline is not None:
+        remaining = int((deadline - time.monotonic()) * 1000)
+        if remaining <= 0:
+            raise DeadlineExceededError("Request deadline exceeded")
+
+        timeout = min(timeout, remaining) if timeout > 0 else remaining
+
+    return timeout
+
+
+class DeadlineExtension(SchemaExtension):
+    """Give queries and mutations `REQUEST_TIMEOUT` seconds to call murmurd"""
+
+    def on_execute(self):
+        if not REQUEST_TIMEOUT or self.execution_context.operation_type == OperationType.SUBSCRIPTION:
+            yield
+            return
+
+        token = _deadline.set(time.monotonic() + REQUEST_TIMEOUT)
+        try:
+            yield
+        finally:
+            _deadline.reset(token)
+
+
+class CircuitBreaker:
+    """Stop calling a server after repeated failures.
+
+    Once open, calls fail immediately until the cooldown passed,
+    then a single call is let through to probe if the server recovered.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+
+            if self._probing or time.monotonic() - self.opened_at < self.cooldown:
+                return False
+
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+            self._probing = False
+
+    def retry_in(self) -> float:
+        if self.opened_at is None:
+            return 0
+
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+
+# Mapping between a server_id -> circuit breaker of its calls
+breakers: dict[int, CircuitBreaker] = {}
+
+
+def get_breaker(server_id: int) -> CircuitBreaker:
+    breaker = breakers.get(server_id)
+    if breaker is None:
+        breaker = breakers.setdefault(
+            server_id, CircuitBreaker(CIRCUIT_BREAKER_THRESHOLD, CIRCUIT_BREAKER_COOLDOWN))
+
+    return breaker
+
+
+class GuardedServer:
+    """Server proxy that applies the invocation timeout, request deadline
+    and circuit breaker of its server to every call.
+
+    `ice_*` proxy methods are passed through unchanged.
+    """
+
+    def __init__(self, server, server_id: int):
+        self._proxy = server
+        self._server_id = server_id
+        self._breaker = get_breaker(server_id)
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._proxy, name)
+        if name.startswith('ice_') or not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            timeout = get_invocation_timeout()
+            if not self._breaker.allow():
+                raise ServerUnavailableError(
+                    f"Server with ID {self._server_id} is unavailable, "
+                    f"retrying in {self._breaker.retry_in():.0f}s"
+                )
+
+            method = getattr(self._proxy.ice_invocationTimeout(timeout), name)
+            if name.endswith('Async'):
+                future = method(*args, **kwargs)
+                future.add_done_callback(self._record_future)
+                return future
+
+            try:
+                result = method(*args, **kwargs)
+            except SERVER_FAILURES:
+                self._breaker.record_failure()
+                raise
+            except Exception:
+                self._breaker.record_success()
+                raise
+
+            self._breaker.record_success()
+            return result
+
+        return call
+
+    def _record_future(self, future: Ice.Future):
+        if isinstance(future.exception(), SERVER_FAILURES):
+            self._breaker.record_failure()
+        else:
+            self._breaker.record_success()
+
+    def __repr__(self):
+        return repr(self._proxy)
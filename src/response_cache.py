@@ -0,0 +1,169 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+
+from graphql import DocumentNode, ExecutionResult, FieldNode
+from strawberry.extensions import SchemaExtension
+from strawberry.types.graphql import OperationType
+
+from mumble import get_server_id
+
+# Fields whose data changes without an event or mutation evicting results,
+# such as bans or configuration edited from a client. Queries selecting any
+# of them are not cached.
+UNCACHEABLE_FIELDS = {
+    'log', 'bans', 'isBanned', 'config', 'welcomeMessage',
+    'permissions', 'effectivePermissions', 'texture',
+}
+
+# Servers touched by the operation currently executing, if it is cacheable
+_dependencies: ContextVar[set[int] | None] = ContextVar(
+    'response_cache_dependencies', default=None)
+
+
+def track_server(server_id: int):
+    """Record that the executing query read state from a server"""
+    dependencies = _dependencies.get()
+    if dependencies is not None:
+        dependencies.add(server_id)
+
+
+class ResponseCache:
+    """Short lived cache of query results keyed by document and variables.
+
+    Each entry remembers the servers it read from, so a change
+    event for one server only evicts the results that depend on it.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 256):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, tuple[float, ExecutionResult, set[int]]] = OrderedDict()
+        self._by_server: dict[int, set[str]] = {}
+        self._lock = threading.Lock()
+
+        # Bumped on every invalidation, so results computed while
+        # an event arrived are never stored.
+        self.generation = 0
+        self._invalidated_at: dict[int, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def get(self, key: str) -> ExecutionResult | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires, result, _ = entry
+            if expires < time.monotonic():
+                self._remove(key)
+                return None
+
+            self._entries.move_to_end(key)
+            return result
+
+    def set(self, key: str, result: ExecutionResult, server_ids: set[int], generation: int):
+        with self._lock:
+            if any(self._invalidated_at.get(s, -1) >= generation for s in server_ids):
+                return
+
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (time.monotonic() + self.ttl, result, server_ids)
+            for server_id in server_ids:
+                self._by_server.setdefault(server_id, set()).add(key)
+
+            if len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_server(self, server_id: int):
+        with self._lock:
+            self._invalidated_at[server_id] = self.generation
+            self.generation += 1
+
+            for key in self._by_server.pop(server_id, set()):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_server.clear()
+
+    def _remove(self, key: str):
+        _, _, server_ids = self._entries.pop(key)
+        for server_id in server_ids:
+            keys = self._by_server.get(server_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_server[server_id]
+
+
+def is_cacheable(document: DocumentNode) -> bool:
+    """Check if a document selects none of `UNCACHEABLE_FIELDS`, in any operation or fragment"""
+    selection_sets = [d.selection_set for d in document.definitions if getattr(d, 'selection_set', None)]
+    while selection_sets:
+        for selection in selection_sets.pop().selections:
+            if isinstance(selection, FieldNode) and selection.name.value in UNCACHEABLE_FIELDS:
+                return False
+
+            if getattr(selection, 'selection_set', None):
+                selection_sets.append(selection.selection_set)
+
+    return True
+
+
+def get_cache_key(query: str, variables: dict | None, operation_name: str | None) -> str:
+    return json.dumps([query, variables, operation_name], sort_keys=True, default=str)
+
+
+class ResponseCacheExtension(SchemaExtension):
+    """Serve repeated queries from `response_cache` while it is enabled"""
+
+    def on_execute(self):
+        context = self.execution_context
+        # Already answered, such as rejected by QueryCostExtension
+        if context.result is not None:
+            yield
+            return
+
+        if not response_cache.enabled or context.operation_type != OperationType.QUERY \
+                or not is_cacheable(context.graphql_document):
+            yield
+            return
+
+        key = get_cache_key(context.query, context.variables, context.operation_name)
+        cached = response_cache.get(key)
+        if cached is not None:
+            context.result = cached
+            yield
+            return
+
+        generation = response_cache.generation
+        dependencies: set[int] = set()
+        token = _dependencies.set(dependencies)
+        try:
+            yield
+        finally:
+            _dependencies.reset(token)
+
+        if context.result is not None and not context.result.errors:
+            response_cache.set(key, context.result, dependencies, generation)
+
+
+response_cache = ResponseCache(
+    ttl=float(os.environ.get('RESPONSE_CACHE_TTL') or 0),
+    maxsize=int(os.environ.get('RESPONSE_CACHE_SIZE') or 256)
+)
+
+
+def invalidate_event_server(event):
+    """Event listener evicting cached results for the server of an event"""
+    response_cache.invalidate_server(get_server_id(event._server))
@@ -1,178 +1,458 @@
 from enum import Enum
-from typing import Optional
+from typing import TYPE_CHECKING, Generic, Optional, TypeVar
 import strawberry
 
-import MumbleServer
-from textures import get_texture_cache, set_texture_cache
-from utils import address_tuple_to_ipv6
+from bans import Ban, get_ban_index, parse_network
+from config import PUBLIC_CONFIG_KEYS, ConfigEntry, get_server_config
+from mumble import get_server_id, is_server_booted
+from permissions import ChannelPermissions, Permission, decode_permissions, fill_effective_permissions, load_effective_permissions
+from query_cost import observe_list_size
+from records import ChannelRecord, UserRecord
+from registry import RegisteredUser, get_registered_user_index, get_user_ids, get_user_names
+from resilience import get_breaker
+from response_cache import track_server
+from server_log import MAX_LOG_ENTRIES, LogEntry, get_log
+from snapshots import ChannelSnapshot, UserSnapshot, get_channel_snapshot, get_tree_snapshots, get_user_snapshot
+from textures import get_texture_cache, is_texture_missing, set_texture_cache
+from utils import address_tuple_to_ipv6, decode_cursor, encode_cursor
+
+if TYPE_CHECKING:
+    import MumbleServer
+
+TNode = TypeVar("TNode")
+
+
+@strawberry.type(description="Information about a page of a connection.")
+class PageInfo:
+    has_next_page: bool = strawberry.field(description="If there are more items after this page.")
+    end_cursor: str | None = strawberry.field(description="Cursor of the last item in this page, or `after` if the page is empty. "
+                                              "Pass as `after` to get the next page.")
 
 
 @strawberry.type
+class Edge(Generic[TNode]):
+    cursor: str = strawberry.field(description="Cursor of this item.")
+    node: TNode = strawberry.field(description="The item.")
+
+
+@strawberry.type
+class Connection(Generic[TNode]):
+    edges: list[Edge[TNode]] = strawberry.field(description="Items in this page.")
+    page_info: PageInfo = strawberry.field(description="Information to fetch more pages.")
+    total_count: int = strawberry.field(description="Number of items matching the filters, across all pages.")
+
+
+@strawberry.enum
+class ServerStatus(Enum):
+    RUNNING = "running"
+    STOPPED = "stopped"
+    UNAVAILABLE = "unavailable"
+
+
+@strawberry.type(description="A virtual server. Fields reading its state are null while it is stopped, "
+                 "or null with an error if murmurd fails to answer for it.")
 class Server:
-    _server: strawberry.Private[MumbleServer.ServerPrx]
+    _server: strawberry.Private["MumbleServer.ServerPrx"]
 
-    def __init__(self, server: MumbleServer.ServerPrx):
+    def __init__(self, server: "MumbleServer.ServerPrx"):
         self._server = server
+        track_server(get_server_id(server))
+
+    def _is_booted(self) -> bool:
+        return is_server_booted(get_server_id(self._server))
 
     @strawberry.field(description="Get the ID of the server.")
     def id(self) -> strawberry.ID:
-        return self._server.id()
+        return get_server_id(self._server)
 
     @strawberry.field(description="Check if the server is running.")
     def is_running(self) -> bool:
-        return self._server.isRunning()
+        return self._is_booted()
+
+    @strawberry.field(description="Get if the server is running, stopped, or not answering. Does not call murmurd.")
+    def status(self) -> ServerStatus:
+        if get_breaker(get_server_id(self._server)).is_open:
+            return ServerStatus.UNAVAILABLE
+
+        return ServerStatus.RUNNING if self._is_booted() else ServerStatus.STOPPED
 
     @strawberry.field(description="Get the channels for this server. This includes all nested channels as a flat list.")
-    def channels(self) -> list["Channel"]:
-        return [Channel(c) for c in self._server.getChannels().values()]
+    def channels(self) -> list["Channel"] | None:
+        if not self._is_booted():
+            return None
+
+        channels = [Channel(c) for c in self._server.getChannels().values()]
+        observe_list_size('Server.channels', get_server_id(self._server), len(channels))
+        return channels
 
     @strawberry.field(description="Get all currently connected users on the server.")
-    def users(self) -> list["User"]:
-        return [User(u, self._server) for u in self._server.getUsers().values()]
+    def users(self) -> list["User"] | None:
+        if not self._is_booted():
+            return None
 
-    @strawberry.field(description="Get the welcome message for the server.")
-    def welcome_message(self) -> str:
-        return self._server.getConf("welcometext")
+        users = [User(u, self._server) for u in self._server.getUsers().values()]
+        observe_list_size('Server.users', get_server_id(self._server), len(users))
+        return users
+
+    @strawberry.field(description="Page through the channels of this server. Ordered by channel ID.")
+    def channels_connection(
+        self,
+        first: int = 100,
+        after: str | None = None,
+        parent_id: strawberry.ID | None = None,
+        name_contains: str | None = None
+    ) -> Connection["Channel"] | None:
+        if first < 0:
+            raise ValueError("first must not be negative")
+
+        if not self._is_booted():
+            return None
 
+        snapshot = get_channel_snapshot(self._server)
+        name_contains = name_contains.lower() if name_contains else None
 
-@strawberry.type
-class Channel:
-    _channel: strawberry.Private[MumbleServer.Channel]
+        channels, has_next_page, total_count = snapshot.page(
+            first,
+            after=decode_cursor('channel', after) if after else None,
+            index=('parent', int(parent_id)) if parent_id is not None else None,
+            predicate=(lambda c: name_contains in c.name.lower()) if name_contains else None
+        )
 
-    def __init__(self, channel: MumbleServer.Channel):
-        self._channel = channel
+        edges = [Edge(cursor=encode_cursor('channel', c.id), node=Channel(c)) for c in channels]
+        observe_list_size('ChannelConnection.edges', get_server_id(self._server), len(edges))
+
+        return Connection(
+            edges=edges,
+            page_info=PageInfo(
+                has_next_page=has_next_page,
+                # An empty page (such as `first: 0`) continues from where it started
+                end_cursor=edges[-1].cursor if edges else after
+            ),
+            total_count=total_count
+        )
 
-    @strawberry.field(description="Get the ID of the channel.")
-    def id(self) -> strawberry.ID:
-        return self._channel.id
+    @strawberry.field(description="Page through connected users, filtered server-side. Ordered by session ID.")
+    def users_connection(
+        self,
+        first: int = 100,
+        after: str | None = None,
+        channel_id: strawberry.ID | None = None,
+        name_contains: str | None = None,
+        registered_only: bool = False
+    ) -> Connection["User"] | None:
+        if first < 0:
+            raise ValueError("first must not be negative")
+
+        if not self._is_booted():
+            return None
 
-    @strawberry.field(description="Get the name of the channel.")
-    def name(self) -> str:
-        return self._channel.name
+        snapshot = get_user_snapshot(self._server)
+        name_contains = name_contains.lower() if name_contains else None
 
-    @strawberry.field(description="Get the ID of the parent channel.")
-    def parent(self) -> strawberry.ID:
-        return self._channel.parent
+        def matches(user: UserRecord) -> bool:
+            if registered_only and user.userid < 0:
+                return False
 
-    @strawberry.field(description="List of linked channel IDs")
-    def links(self) -> list[strawberry.ID] | None:
-        self._channel.links
+            return not name_contains or name_contains in user.name.lower()
 
-    @strawberry.field(description="Get the description of the channel.")
-    def description(self) -> str:
-        return self._channel.description
+        users, has_next_page, total_count = snapshot.page(
+            first,
+            after=decode_cursor('user', after) if after else None,
+            index=('channel', int(channel_id)) if channel_id is not None else None,
+            predicate=matches if registered_only or name_contains else None
+        )
 
-    @strawberry.field(description="Check if the channel is temporary.")
-    def temporary(self) -> bool:
-        return self._channel.temporary
+        edges = [Edge(cursor=encode_cursor('user', u.session), node=User(u, self._server)) for u in users]
+        observe_list_size('UserConnection.edges', get_server_id(self._server), len(edges))
+
+        return Connection(
+            edges=edges,
+            page_info=PageInfo(
+                has_next_page=has_next_page,
+                # An empty page (such as `first: 0`) continues from where it started
+                end_cursor=edges[-1].cursor if edges else after
+            ),
+            total_count=total_count
+        )
 
-    @strawberry.field(description="Position of the channel which is used in Client for sorting.")
-    def position(self) -> int:
-        return self._channel.position
+    @strawberry.field(description="Page through registered user accounts whose name starts with `prefix`, ignoring case. "
+                      "Ordered by name. Answered from an index of all accounts, refreshed every `REGISTERED_USERS_TTL` seconds.")
+    def registered_users(
+        self,
+        prefix: str = "",
+        first: int = 100,
+        after: str | None = None
+    ) -> Connection[RegisteredUser] | None:
+        if first < 0:
+            raise ValueError("first must not be negative")
+
+        if not self._is_booted():
+            return None
 
+        users, has_next_page, total_count = get_registered_user_index(self._server).page(
+            prefix, first, decode_cursor('registered', after) if after else None)
+
+        edges = [
+            Edge(cursor=encode_cursor('registered', i), node=RegisteredUser(id=i, name=name))
+            for i, name in users
+        ]
+        observe_list_size('RegisteredUserConnection.edges', get_server_id(self._server), len(edges))
+
+        return Connection(
+            edges=edges,
+            page_info=PageInfo(
+                has_next_page=has_next_page,
+                # An empty page (such as `first: 0`) continues from where it started
+                end_cursor=edges[-1].cursor if edges else after
+            ),
+            total_count=total_count
+        )
 
-@strawberry.input
-class UserStateInput:
-    id: strawberry.ID
-    channel: Optional[strawberry.ID] = None
-    mute: Optional[bool] = None
-    deaf: Optional[bool] = None
-    suppress: Optional[bool] = None
+    @strawberry.field(description="Get registered user accounts by ID, in the same order. Null for unknown IDs.")
+    def registered_users_by_id(self, ids: list[strawberry.ID]) -> list[RegisteredUser | None] | None:
+        if not self._is_booted():
+            return None
 
+        names = get_user_names(self._server, [int(i) for i in ids])
+        return [RegisteredUser(id=i, name=names[int(i)]) if int(i) in names else None for i in ids]
 
-@strawberry.type
-class User:
-    _user: strawberry.Private[MumbleServer.User]
-    _server: strawberry.Private[MumbleServer.ServerPrx]
+    @strawberry.field(description="Get registered user accounts by name, in the same order. Null for unknown names.")
+    def registered_users_by_name(self, names: list[str]) -> list[RegisteredUser | None] | None:
+        if not self._is_booted():
+            return None
 
-    def __init__(self, user: MumbleServer.User, server: MumbleServer.ServerPrx):
-        self._user = user
-        self._server = server
+        ids = get_user_ids(self._server, names)
+        index = get_registered_user_index(self._server)
+        return [RegisteredUser(id=ids[n], name=index.names.get(ids[n], n)) if n in ids else None for n in names]
 
-    @strawberry.field(description="Session ID. This identifies the connection to the server.")
-    def id(self) -> strawberry.ID:
-        return self._user.session
+    @strawberry.field(description="Get the channel hierarchy with the users in each channel.")
+    def tree(self, root_channel_id: strawberry.ID = "0", depth: int | None = None) -> Optional["ChannelTree"]:
+        if not self._is_booted():
+            return None
 
-    @strawberry.field(description="Registered User ID. -1 if the user is anonymous.")
-    def user_id(self) -> strawberry.ID:
-        return self._user.userid
+        channels, users = get_tree_snapshots(self._server)
+        if channels.get(int(root_channel_id)) is None:
+            raise ValueError(f"Channel with ID {root_channel_id} not found")
+
+        return ChannelTree(int(root_channel_id), depth, channels, users, self._server)
+
+    @strawberry.field(description="Get the effective permissions of users in channels, all connected users "
+                      "and all channels unless limited. Cached until users or channels change.")
+    async def permissions(
+        self,
+        session_ids: list[strawberry.ID] | None = None,
+        channel_ids: list[strawberry.ID] | None = None
+    ) -> list[ChannelPermissions] | None:
+        if not self._is_booted():
+            return None
+
+        sessions = [int(s) for s in session_ids] if session_ids is not None else \
+            [u.session for u in get_user_snapshot(self._server).values()]
+        channels = [int(c) for c in channel_ids] if channel_ids is not None else \
+            [c.id for c in get_channel_snapshot(self._server).values()]
+
+        permissions = await fill_effective_permissions(self._server, sessions, channels)
+        observe_list_size('Server.permissions', get_server_id(self._server), len(permissions))
+        return [
+            ChannelPermissions(session_id=s, channel_id=c, permissions=decode_permissions(bits))
+            for (s, c), bits in permissions.items()
+        ]
+
+    @strawberry.field(description="Get the bans of the server. Cached for `BAN_CACHE_TTL` seconds.")
+    def bans(self) -> list[Ban] | None:
+        if not self._is_booted():
+            return None
+
+        bans = [Ban.from_ice(b) for b in get_ban_index(self._server).bans]
+        observe_list_size('Server.bans', get_server_id(self._server), len(bans))
+        return bans
 
-    @strawberry.field(description="The name of the user.")
-    def name(self) -> str:
-        return self._user.name
+    @strawberry.field(description="Check if an IPv4 or IPv6 address is covered by an active ban of the server. "
+                      "Answered from the cached bans.")
+    def is_banned(self, address: str) -> bool | None:
+        network = parse_network(address)
+        if network.prefixlen != 128:
+            raise ValueError(f"Invalid address: {address}")
 
-    @strawberry.field(description="User comment. Shown as tooltip for this user.")
-    def comment(self) -> str:
-        return self._user.comment
+        if not self._is_booted():
+            return None
 
-    @strawberry.field(description="Channel ID the user is in. Matches `Channel.id`.")
-    def channel(self) -> strawberry.ID:
-        return self._user.channel
+        return bool(get_ban_index(self._server).match(network.network_address))
 
-    @strawberry.field(description="Is user muted by the server?")
-    def mute(self) -> bool:
-        return self._user.mute
+    @strawberry.field(description="Get entries `first` up to (not including) `last` of the server log, where 0 is the most recent entry. "
+                      "Most recent first. Available while the server is stopped as well.")
+    def log(self, first: int = 0, last: int = 100) -> list[LogEntry] | None:
+        if first < 0 or last < first:
+            raise ValueError("first must not be negative or greater than last")
 
-    @strawberry.field(description="Is the user self-muted?")
-    def self_mute(self) -> bool:
-        return self._user.selfMute
+        if last - first > MAX_LOG_ENTRIES:
+            raise ValueError(f"Cannot get more than {MAX_LOG_ENTRIES} log entries at once")
 
-    @strawberry.field(description="Is user deafened by the server? If true, this implies mute.")
-    def deaf(self) -> bool:
-        return self._user.deaf
+        server_id = get_server_id(self._server)
+        entries = get_log(self._server, server_id, first, last - first)
+        observe_list_size('Server.log', server_id, len(entries))
+        return entries
 
-    @strawberry.field(description="Is the user self-deafened? If true, this implies mute.")
-    def self_deaf(self) -> bool:
-        return self._user.selfDeaf
+    @strawberry.field(description="Get the welcome message for the server.")
+    def welcome_message(self) -> str | None:
+        return get_server_config(self._server).get("welcometext")
 
-    @strawberry.field(description="Is user suppressed by the server? If true, this implies mute.")
-    def suppress(self) -> bool:
-        return self._user.suppress
+    @strawberry.field(description="Get configuration items of the server, all of them unless limited to `keys`. "
+                      "Cached for `CONFIG_CACHE_TTL` seconds. Only public settings are returned, "
+                      "secrets such as the server password are left out.")
+    def config(self, keys: list[str] | None = None) -> list[ConfigEntry] | None:
+        config = get_server_config(self._server)
+        return [
+            ConfigEntry(key=key, value=config[key])
+            for key in (keys if keys is not None else sorted(config))
+            if key in config and key.lower() in PUBLIC_CONFIG_KEYS
+        ]
 
-    @strawberry.field(description="Is the User recording?")
-    def recording(self) -> bool:
-        return self._user.selfDeaf
 
-    @strawberry.field(description="Seconds user has been online.")
-    def online_secs(self) -> int:
-        return self._user.onlinesecs
+@strawberry.type
+class Channel:
+    id: strawberry.ID = strawberry.field(description="Get the ID of the channel.")
+    name: str = strawberry.field(description="Get the name of the channel.")
+    parent: strawberry.ID = strawberry.field(description="Get the ID of the parent channel.")
+    links: list[strawberry.ID] = strawberry.field(description="List of linked channel IDs")
+    description: str = strawberry.field(description="Get the description of the channel.")
+    temporary: bool = strawberry.field(description="Check if the channel is temporary.")
+    position: int = strawberry.field(description="Position of the channel which is used in Client for sorting.")
+
+    _channel: strawberry.Private["MumbleServer.Channel | ChannelRecord"]
+
+    def __init__(self, channel: "MumbleServer.Channel | ChannelRecord"):
+        # Copied up front so the default resolvers read them,
+        # instead of calling a Python resolver per field and channel
+        self._channel = channel
+        self.id = channel.id
+        self.name = channel.name
+        self.parent = channel.parent
+        self.links = channel.links
+        self.description = channel.description
+        self.temporary = channel.temporary
+        self.position = channel.position
+
+
+@strawberry.type(description="A channel with its users and subchannels.")
+class ChannelTree:
+    _channel_id: strawberry.Private[int]
+    _depth: strawberry.Private[int | None]
+    _channels: strawberry.Private[ChannelSnapshot]
+    _users: strawberry.Private[UserSnapshot]
+    _server: strawberry.Private["MumbleServer.ServerPrx"]
+
+    def __init__(self, channel_id: int, depth: int | None, channels: ChannelSnapshot, users: UserSnapshot, server: "MumbleServer.ServerPrx"):
+        self._channel_id = channel_id
+        self._depth = depth
+        self._channels = channels
+        self._users = users
+        self._server = server
 
-    @strawberry.field(description="Idle time. This is how many seconds it is since the user last spoke. Other activity is not counted.")
-    def idle_secs(self) -> int:
-        return self._user.idlesecs
+    @strawberry.field(description="The channel at this level of the tree.")
+    def channel(self) -> Channel | None:
+        # Events update the snapshot while the tree resolves
+        channel = self._channels.get(self._channel_id)
+        if channel is None:
+            raise ValueError(f"Channel with ID {self._channel_id} was removed")
 
-    @strawberry.field(description="Average transmission rate in bytes per second over the last few seconds.")
-    def bytes_per_sec(self) -> int:
-        return self._user.bytespersec
+        return Channel(channel)
 
-    @strawberry.field(description="Client OS.")
-    def os(self) -> str:
-        return self._user.os
+    @strawberry.field(description="Users in this channel. Does not include users in subchannels.")
+    def users(self) -> list["User"]:
+        users = [User(u, self._server) for u in self._users.lookup('channel', self._channel_id)]
+        observe_list_size('ChannelTree.users', get_server_id(self._server), len(users))
+        return users
 
-    @strawberry.field(description="Client OS Version.")
-    def os_version(self) -> str:
-        return self._user.osversion
+    @strawberry.field(description="Subchannels of this channel. Empty once the requested depth is reached.")
+    def children(self) -> list["ChannelTree"]:
+        if self._depth is not None and self._depth <= 0:
+            return []
 
-    @strawberry.field(description="Client version.")
-    def version(self) -> str:
-        return self._user.version or self._user.version2
+        depth = self._depth - 1 if self._depth is not None else None
+        children = [
+            ChannelTree(c.id, depth, self._channels, self._users, self._server)
+            for c in self._channels.lookup('parent', self._channel_id)
+        ]
+        observe_list_size('ChannelTree.children', get_server_id(self._server), len(children))
+        return children
 
-    @strawberry.field(description="Client release. For official releases, this equals the version. For snapshots and git compiles, this will be something else.")
-    def release(self) -> str:
-        return self._user.release
+
+@strawberry.input
+class UserStateInput:
+    id: strawberry.ID
+    channel: Optional[strawberry.ID] = None
+    mute: Optional[bool] = None
+    deaf: Optional[bool] = None
+    suppress: Optional[bool] = None
+
+
+@strawberry.type
+class User:
+    id: strawberry.ID = strawberry.field(description="Session ID. This identifies the connection to the server.")
+    user_id: strawberry.ID = strawberry.field(description="Registered User ID. -1 if the user is anonymous.")
+    name: str = strawberry.field(description="The name of the user.")
+    comment: str = strawberry.field(description="User comment. Shown as tooltip for this user.")
+    channel: strawberry.ID = strawberry.field(description="Channel ID the user is in. Matches `Channel.id`.")
+    mute: bool = strawberry.field(description="Is user muted by the server?")
+    self_mute: bool = strawberry.field(description="Is the user self-muted?")
+    deaf: bool = strawberry.field(description="Is user deafened by the server? If true, this implies mute.")
+    self_deaf: bool = strawberry.field(description="Is the user self-deafened? If true, this implies mute.")
+    suppress: bool = strawberry.field(description="Is user suppressed by the server? If true, this implies mute.")
+    recording: bool = strawberry.field(description="Is the User recording?")
+    online_secs: int = strawberry.field(description="Seconds user has been online.")
+    idle_secs: int = strawberry.field(description="Idle time. This is how many seconds it is since the user last spoke. Other activity is not counted.")
+    bytes_per_sec: int = strawberry.field(description="Average transmission rate in bytes per second over the last few seconds.")
+    os: str = strawberry.field(description="Client OS.")
+    os_version: str = strawberry.field(description="Client OS Version.")
+    version: str = strawberry.field(description="Client version.")
+    release: str = strawberry.field(description="Client release. For official releases, this equals the version. For snapshots and git compiles, this will be something else.")
+
+    _user: strawberry.Private["MumbleServer.User | UserRecord"]
+    _server: strawberry.Private["MumbleServer.ServerPrx"]
+
+    def __init__(self, user: "MumbleServer.User | UserRecord", server: "MumbleServer.ServerPrx"):
+        # Copied up front so the default resolvers read them,
+        # instead of calling a Python resolver per field and user
+        self._user = user
+        self._server = server
+        self.id = user.session
+        self.user_id = user.userid
+        self.name = user.name
+        self.comment = user.comment
+        self.channel = user.channel
+        self.mute = user.mute
+        self.self_mute = user.selfMute
+        self.deaf = user.deaf
+        self.self_deaf = user.selfDeaf
+        self.suppress = user.suppress
+        self.recording = user.recording
+        self.online_secs = user.onlinesecs
+        self.idle_secs = user.idlesecs
+        self.bytes_per_sec = user.bytespersec
+        self.os = user.os
+        self.os_version = user.osversion
+        self.version = user.version or getattr(user, 'version2', 0)
+        self.release = user.release
 
     @strawberry.field(description="Client address.")
     def address(self) -> str:
         return address_tuple_to_ipv6(self._user.address)
 
+    @strawberry.field(description="Permissions of the user in a channel. Cached until the user or channels change.")
+    async def effective_permissions(self, channel_id: strawberry.ID) -> list[Permission]:
+        return decode_permissions(await load_effective_permissions(self._server, self._user.session, int(channel_id)))
+
     @strawberry.field(description="Base64 encoded texture data URI. Only available for registered users.")
     def texture(self) -> str | None:
         # ServerPrx.getTexture is only for registered users.
         if self._user.userid == -1:
             return None
 
-        server_id = self._server.id()
+        server_id = get_server_id(self._server)
         user_id = self._user.userid
+        if is_texture_missing(server_id, user_id):
+            return None
 
         return get_texture_cache(server_id, user_id) or set_texture_cache(
             server_id,
@@ -183,11 +463,11 @@ class User:
 
 @strawberry.type(description="Event when a user sends a text message.")
 class TextMessageEvent:
-    _user: strawberry.Private[MumbleServer.User]
-    _message: strawberry.Private[MumbleServer.TextMessage]
-    _server: strawberry.Private[MumbleServer.ServerPrx]
+    _user: strawberry.Private[UserRecord]
+    _message: strawberry.Private["MumbleServer.TextMessage"]
+    _server: strawberry.Private["MumbleServer.ServerPrx"]
 
-    def __init__(self, user: MumbleServer.User, message: MumbleServer.TextMessage, server: MumbleServer.ServerPrx):
+    def __init__(self, user: UserRecord, message: "MumbleServer.TextMessage", server: "MumbleServer.ServerPrx"):
         self._user = user
         self._message = message
         self._server = server
@@ -202,7 +482,7 @@ class TextMessageEvent:
 
     @strawberry.field(description="The server this message was sent to.")
     def server_id(self) -> strawberry.ID:
-        return self._server.id()
+        return get_server_id(self._server)
 
     @strawberry.field(description="Channels who were sent this message. Matches `Channel.id`.")
     def channel_ids(self) -> list[strawberry.ID]:
@@ -224,10 +504,10 @@ class UserChangeType(Enum):
 class UserChangeEvent:
     changeType: UserChangeType
 
-    _server: strawberry.Private[MumbleServer.ServerPrx]
-    _user: strawberry.Private[MumbleServer.User]
+    _server: strawberry.Private["MumbleServer.ServerPrx"]
+    _user: strawberry.Private[UserRecord]
 
-    def __init__(self, changeType: UserChangeType, user: MumbleServer.User, server: MumbleServer.ServerPrx):
+    def __init__(self, changeType: UserChangeType, user: UserRecord, server: "MumbleServer.ServerPrx"):
         self.changeType = changeType
         self._user = user
         self._server = server
@@ -238,7 +518,7 @@ class UserChangeEvent:
 
     @strawberry.field(description="The server this user is connected to.")
     def server_id(self) -> strawberry.ID:
-        return self._server.id()
+        return get_server_id(self._server)
 
 
 @strawberry.enum
@@ -252,10 +532,10 @@ class ChannelChangeType(Enum):
 class ChannelChangeEvent:
     changeType: ChannelChangeType
 
-    _channel: strawberry.Private[MumbleServer.Channel]
-    _server: strawberry.Private[MumbleServer.ServerPrx]
+    _channel: strawberry.Private[ChannelRecord]
+    _server: strawberry.Private["MumbleServer.ServerPrx"]
 
-    def __init__(self, changeType: ChannelChangeType, channel: MumbleServer.Channel, server: MumbleServer.ServerPrx):
+    def __init__(self, changeType: ChannelChangeType, channel: ChannelRecord, server: "MumbleServer.ServerPrx"):
         self.changeType = changeType
         self._channel = channel
         self._server = server
@@ -266,4 +546,30 @@ class ChannelChangeEvent:
 
     @strawberry.field(description="The parent server for this channel.")
     def server_id(self) -> strawberry.ID:
-        return self._server.id()
+        return get_server_id(self._server)
+
+
+@strawberry.enum
+class LivePatchOp(Enum):
+    UPSERT = "upsert"
+    REMOVE = "remove"
+
+
+@strawberry.type(description="A change to one user or channel of a live server.")
+class LivePatch:
+    op: LivePatchOp = strawberry.field(description="Replace the user or channel with the same ID, adding it if missing, or remove it.")
+    user: User | None = strawberry.field(description="The user that changed, if this patch is for a user.")
+    channel: Channel | None = strawberry.field(description="The channel that changed, if this patch is for a channel.")
+
+
+@strawberry.type(description="The channels and users of a server at the start of a live subscription.")
+class LiveSnapshot:
+    channels: list[Channel] = strawberry.field(description="All channels, ordered by ID.")
+    users: list[User] = strawberry.field(description="All connected users, ordered by session ID.")
+
+
+@strawberry.type(description="Update of a live server. The first has the snapshot, every later one the patches since the previous.")
+class LiveServerUpdate:
+    sequence: int = strawberry.field(description="Number of this update, starting at 0 for the snapshot.")
+    snapshot: LiveSnapshot | None = strawberry.field(description="Full state to start from. Only set on the first update.")
+    patches: list[LivePatch] = strawberry.field(description="Changes to apply to the state in order.")
@@ -0,0 +1,127 @@
+import os
+import threading
+from typing import TYPE_CHECKING
+
+import strawberry
+
+from mumble import get_mumble_server
+
+if TYPE_CHECKING:
+    import MumbleServer
+
+# Seconds between checks for new log entries of servers someone subscribed to
+LOG_POLL_INTERVAL = float(os.environ.get('LOG_POLL_INTERVAL') or 2)
+
+# Log entries fetched per getLog call
+LOG_CHUNK_SIZE = 100
+
+# Most log entries fetched at once, by a query or by one poll
+MAX_LOG_ENTRIES = 1000
+
+
+@strawberry.type(description="An entry of a server log.")
+class LogEntry:
+    timestamp: int = strawberry.field(description="Time of the entry in unix time format.")
+    text: str = strawberry.field(description="The logged message.")
+    server_id: strawberry.ID = strawberry.field(description="The server that logged this.")
+    skipped: int = strawberry.field(default=0, description="Entries logged right before this one that `serverLog` skipped, "
+                                    f"as more than {MAX_LOG_ENTRIES} were logged between two polls. Always 0 in queries.")
+
+
+def get_log(server: "MumbleServer.ServerPrx", server_id: int, first: int, count: int) -> list[LogEntry]:
+    """Get `count` log entries starting at `first`, most recent first, in chunks of `LOG_CHUNK_SIZE`"""
+    entries = []
+    for start in range(first, first + count, LOG_CHUNK_SIZE):
+        size = min(LOG_CHUNK_SIZE, first + count - start)
+        # murmurd uses `last` as the number of entries to return, not an offset
+        chunk = server.getLog(start, size)
+        entries += [LogEntry(timestamp=e.timestamp, text=e.txt, server_id=server_id) for e in chunk]
+
+        if len(chunk) < size:
+            break
+
+    return entries
+
+
+def get_new_log(server: "MumbleServer.ServerPrx", server_id: int, seen: int | None) -> tuple[int, list[LogEntry]]:
+    """Get the log length, and the entries added since the log was `seen` entries long, oldest first.
+
+    Offsets count from the most recent entry, so entries logged while fetching shift them.
+    The fetch is repeated if the length changed in the meantime, and if it keeps changing
+    `seen` is returned as is, to fetch the same entries on the next poll.
+
+    At most `MAX_LOG_ENTRIES` are fetched, the most recent ones. The oldest of them
+    counts the entries before it that were skipped.
+    """
+    for _ in range(3):
+        length = server.getLogLen()
+        if seen is None or length <= seen:
+            # First poll, or murmurd pruned old entries and the length can't tell what is new
+            return length, []
+
+        added = length - seen
+        entries = get_log(server, server_id, 0, min(added, MAX_LOG_ENTRIES))
+        if server.getLogLen() == length:
+            break
+    else:
+        return seen, []
+
+    entries.reverse()
+    if entries and added > len(entries):
+        entries[0].skipped = added - len(entries)
+
+    return length, entries
+
+
+class LogTail:
+    """Poll the log of one server for new entries while anyone subscribes to it,
+    publishing them to `server_log_events`.
+
+    One thread polls per server, however many clients subscribed.
+    """
+
+    def __init__(self, server_id: int):
+        self.server_id = server_id
+        self._subscribers = 0
+        self._stop: threading.Event | None = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            self._subscribers += 1
+            if self._stop is None:
+                self._stop = threading.Event()
+                threading.Thread(target=self._run, args=(self._stop,), daemon=True).start()
+
+    def stop(self):
+        with self._lock:
+            self._subscribers -= 1
+            if self._subscribers == 0 and self._stop is not None:
+                self._stop.set()
+                self._stop = None
+
+    def _run(self, stop: threading.Event):
+        from events import server_log_events
+
+        seen = None
+        while True:
+            # Looked up every time, the proxies are replaced on reconnect
+            server = get_mumble_server(self.server_id)
+            if server is not None:
+                try:
+                    seen, entries = get_new_log(server, self.server_id, seen)
+                    for entry in entries:
+                        server_log_events.publish(entry)
+                except Exception as e:
+                    print(f"Error polling log of server {self.server_id}: {e}")
+
+            if stop.wait(LOG_POLL_INTERVAL):
+                return
+
+
+# Mapping between a server_id -> poller of its log
+log_tails: dict[int, LogTail] = {}
+
+
+def get_log_tail(server_id: int) -> LogTail:
+    return log_tails.setdefault(server_id, LogTail(server_id))
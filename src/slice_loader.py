@@ -0,0 +1,59 @@
+import importlib
+import os
+import time
+from types import ModuleType
+
+import Ice
+
+# Generated Slice packages, keyed by the type ID of their Meta interface.
+# MumbleServer ships with murmurd 1.5+, Murmur with everything before.
+SLICE_MODULES = {
+    '::MumbleServer::Meta': 'MumbleServer',
+    '::Murmur::Meta': 'Murmur',
+}
+
+_slice_module: ModuleType = None
+
+
+def detect_slice_module(base: Ice.ObjectPrx) -> str:
+    """Find the name of the Slice module implemented by a Meta proxy.
+
+    Uses `ice_isA` which is part of every Ice object, so no generated
+    code needs to be imported to ask murmurd what it speaks.
+    Can be forced with the `ICE_SLICE` envvar.
+    """
+    forced = os.environ.get('ICE_SLICE')
+    if forced:
+        if forced not in SLICE_MODULES.values():
+            raise ValueError(f"Unknown ICE_SLICE module: {forced}")
+        return forced
+
+    for type_id, name in SLICE_MODULES.items():
+        if base.ice_isA(type_id):
+            return name
+
+    raise RuntimeError(f"No known Slice module for proxy {base}")
+
+
+def load_slice_module(name: str) -> ModuleType:
+    """Import a generated Slice package, once per process"""
+    global _slice_module
+    if _slice_module is not None:
+        if _slice_module.__name__ != name:
+            raise RuntimeError(
+                f"Slice module {_slice_module.__name__} already loaded, cannot switch to {name}")
+        return _slice_module
+
+    start = time.perf_counter()
+    _slice_module = importlib.import_module(name)
+    print(f"Loaded {name} slice in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    return _slice_module
+
+
+def get_slice_module() -> ModuleType:
+    """Get the loaded Slice package. Only valid after connecting."""
+    if _slice_module is None:
+        raise RuntimeError('Slice module not loaded yet')
+
+    return _slice_module
@@ -0,0 +1,229 @@
+import bisect
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Callable, Generic, Iterable, TypeVar
+
+from mumble import get_server_id
+from records import ChannelRecord, UserRecord
+
+if TYPE_CHECKING:
+    import MumbleServer
+
+# Seconds before a snapshot is rebuilt from murmurd. Events keep snapshots
+# current in between, this bounds drift of counters like `onlinesecs`.
+SNAPSHOT_TTL = float(os.environ.get('SNAPSHOT_TTL') or 5)
+
+TItem = TypeVar("TItem")
+
+
+class IndexedSnapshot(ABC, Generic[TItem]):
+    """Items of a server sorted by ID, with secondary indexes for filtering"""
+
+    # Mapping between an index name -> function getting the indexed value of an item
+    index_keys: dict[str, Callable[[TItem], int]] = {}
+
+    def __init__(self, items: Iterable[TItem]):
+        self.created = time.monotonic()
+        self.items: dict[int, TItem] = {}
+        self.ids: list[int] = []
+        self.indexes: dict[str, dict[int, list[int]]] = {
+            name: {} for name in self.index_keys
+        }
+        self._lock = threading.Lock()
+
+        for item in items:
+            self._insert(item)
+
+    @staticmethod
+    @abstractmethod
+    def get_id(item: TItem) -> int:
+        """Get the ID items are sorted and looked up by"""
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() - self.created > SNAPSHOT_TTL
+
+    def upsert(self, item: TItem):
+        with self._lock:
+            self._remove(self.get_id(item))
+            self._insert(item)
+
+    def remove(self, item_id: int):
+        with self._lock:
+            self._remove(item_id)
+
+    def get(self, item_id: int) -> TItem | None:
+        return self.items.get(item_id)
+
+    def values(self) -> list[TItem]:
+        """Get all items, ordered by ID"""
+        with self._lock:
+            return [self.items[i] for i in self.ids]
+
+    def descendants(self, index: str, roots: Iterable[int]) -> set[int]:
+        """Get the IDs of `roots` and everything below them through a self-referencing index"""
+        found = set()
+        pending = list(roots)
+        with self._lock:
+            while pending:
+                item_id = pending.pop()
+                if item_id in found:
+                    continue
+
+                found.add(item_id)
+                pending.extend(self.indexes[index].get(item_id, []))
+
+        return found
+
+    def lookup(self, index: str, value: int) -> list[TItem]:
+        """Get all items with the given value in a secondary index, ordered by ID"""
+        with self._lock:
+            return [self.items[i] for i in self.indexes[index].get(value, [])]
+
+    def page(
+        self,
+        first: int,
+        after: int | None = None,
+        index: tuple[str, int] | None = None,
+        predicate: Callable[[TItem], bool] | None = None
+    ) -> tuple[list[TItem], bool, int]:
+        """Get up to `first` items with an ID greater than `after`.
+
+        Returns the page, if there are more matching items,
+        and the total number of matching items.
+        """
+        if first < 0:
+            raise ValueError("first must not be negative")
+
+        with self._lock:
+            if index:
+                name, value = index
+                ids = self.indexes[name].get(value, [])
+            else:
+                ids = self.ids
+
+            if predicate is not None:
+                ids = [i for i in ids if predicate(self.items[i])]
+
+            start = bisect.bisect_right(ids, after) if after is not None else 0
+            page = [self.items[i] for i in ids[start:start + first]]
+
+            return page, start + first < len(ids), len(ids)
+
+    def _insert(self, item: TItem):
+        item_id = self.get_id(item)
+        self.items[item_id] = item
+        bisect.insort(self.ids, item_id)
+
+        for name, key in self.index_keys.items():
+            bisect.insort(self.indexes[name].setdefault(key(item), []), item_id)
+
+    def _remove(self, item_id: int):
+        item = self.items.pop(item_id, None)
+        if item is None:
+            return
+
+        self.ids.remove(item_id)
+        for name, key in self.index_keys.items():
+            self.indexes[name][key(item)].remove(item_id)
+
+
+class UserSnapshot(IndexedSnapshot[UserRecord]):
+    """Connected users of a server, by session and by channel"""
+    index_keys = {'channel': lambda u: u.channel}
+
+    @staticmethod
+    def get_id(user: UserRecord) -> int:
+        return user.session
+
+
+class ChannelSnapshot(IndexedSnapshot[ChannelRecord]):
+    """Channels of a server, by ID and by parent"""
+    index_keys = {'parent': lambda c: c.parent}
+
+    @staticmethod
+    def get_id(channel: ChannelRecord) -> int:
+        return channel.id
+
+
+# Mapping between a server_id -> latest snapshot
+user_snapshots: dict[int, UserSnapshot] = {}
+channel_snapshots: dict[int, ChannelSnapshot] = {}
+
+
+def get_user_snapshot(server: "MumbleServer.ServerPrx") -> UserSnapshot:
+    server_id = get_server_id(server)
+    snapshot = user_snapshots.get(server_id)
+    if snapshot is None or snapshot.expired:
+        snapshot = UserSnapshot(UserRecord.from_ice(u) for u in server.getUsers().values())
+        user_snapshots[server_id] = snapshot
+
+    return snapshot
+
+
+def get_channel_snapshot(server: "MumbleServer.ServerPrx") -> ChannelSnapshot:
+    server_id = get_server_id(server)
+    snapshot = channel_snapshots.get(server_id)
+    if snapshot is None or snapshot.expired:
+        snapshot = ChannelSnapshot(ChannelRecord.from_ice(c) for c in server.getChannels().values())
+        channel_snapshots[server_id] = snapshot
+
+    return snapshot
+
+
+def get_tree_snapshots(server: "MumbleServer.ServerPrx") -> tuple[ChannelSnapshot, UserSnapshot]:
+    """Get both snapshots of a server, refreshing them with one getTree call if needed"""
+    server_id = get_server_id(server)
+    channels = channel_snapshots.get(server_id)
+    users = user_snapshots.get(server_id)
+    if channels is not None and users is not None and not channels.expired and not users.expired:
+        return channels, users
+
+    tree = server.getTree()
+    all_channels = []
+    all_users = []
+    nodes = [tree]
+    while nodes:
+        node = nodes.pop()
+        all_channels.append(ChannelRecord.from_ice(node.c))
+        all_users.extend(UserRecord.from_ice(u) for u in node.users)
+        nodes.extend(node.children)
+
+    channels = ChannelSnapshot(all_channels)
+    users = UserSnapshot(all_users)
+    channel_snapshots[server_id] = channels
+    user_snapshots[server_id] = users
+
+    return channels, users
+
+
+def apply_user_event(event):
+    """Event listener keeping user snapshots current"""
+    snapshot = user_snapshots.get(get_server_id(event._server))
+    if snapshot is None:
+        return
+
+    if event.changeType.value == 'disconnected':
+        snapshot.remove(event._user.session)
+    else:
+        snapshot.upsert(event._user)
+
+
+def apply_channel_event(event):
+    """Event listener keeping channel snapshots current"""
+    snapshot = channel_snapshots.get(get_server_id(event._server))
+    if snapshot is None:
+        return
+
+    if event.changeType.value == 'removed':
+        snapshot.remove(event._channel.id)
+    else:
+        snapshot.upsert(event._channel)
+
+
+def drop_snapshots(server_id: int):
+    """Forget snapshots of a server, such as when it stops"""
+    user_snapshots.pop(server_id, None)
+    channel_snapshots.pop(server_id, None)
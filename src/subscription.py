@@ -1,18 +1,61 @@
 
 import asyncio
 import typing
+from enum import Enum
 import strawberry
+from strawberry import ID
 
-from events import EventManager, text_message_events, user_change_events, channel_change_events
-from schema_types import ChannelChangeEvent, TextMessageEvent, UserChangeEvent
+from events import EventManager, all_events, text_message_events, user_change_events, channel_change_events, server_log_events
+from mumble import get_mumble_server, get_server_id
+from schema_types import (
+    Channel,
+    ChannelChangeEvent,
+    ChannelChangeType,
+    LivePatch,
+    LivePatchOp,
+    LiveServerUpdate,
+    LiveSnapshot,
+    TextMessageEvent,
+    User,
+    UserChangeEvent,
+    UserChangeType,
+)
+from server_log import LogEntry, get_log_tail
+from snapshots import get_tree_snapshots
 
+if typing.TYPE_CHECKING:
+    import MumbleServer
 
-async def create_subscription(manager: EventManager):
+
+Event = typing.Annotated[
+    TextMessageEvent | UserChangeEvent | ChannelChangeEvent,
+    strawberry.union("Event", description="Any event of the `textMessage`, `userChange` and `channelChange` subscriptions.")
+]
+
+
+@strawberry.enum
+class EventType(Enum):
+    TEXT_MESSAGE = "text_message"
+    USER_CHANGE = "user_change"
+    CHANNEL_CHANGE = "channel_change"
+
+
+event_classes: dict[EventType, type] = {
+    EventType.TEXT_MESSAGE: TextMessageEvent,
+    EventType.USER_CHANGE: UserChangeEvent,
+    EventType.CHANNEL_CHANGE: ChannelChangeEvent,
+}
+
+
+async def create_subscription(manager: EventManager, predicate: typing.Callable[[typing.Any], bool] | None = None):
     try:
         subscription_id = manager.add_subscriber()
 
         while True:
             events = manager.flush_subscriber(subscription_id)
+            if predicate is not None:
+                events = [e for e in events if predicate(e)]
+
             if len(events) > 0:
                 yield events
 
@@ -27,6 +70,67 @@ async def create_subscription(manager: EventManager):
         raise ValueError(f"Error in subscription: {e}")
 
 
+def to_live_patch(event: UserChangeEvent | ChannelChangeEvent, server: "MumbleServer.ServerPrx") -> LivePatch:
+    if isinstance(event, UserChangeEvent):
+        op = LivePatchOp.REMOVE if event.changeType == UserChangeType.DISCONNECTED else LivePatchOp.UPSERT
+        return LivePatch(op=op, user=User(event._user, server), channel=None)
+
+    op = LivePatchOp.REMOVE if event.changeType == ChannelChangeType.REMOVED else LivePatchOp.UPSERT
+    return LivePatch(op=op, user=None, channel=Channel(event._channel))
+
+
+async def create_live_subscription(server: "MumbleServer.ServerPrx"):
+    """Emit a snapshot of a server, then patches for every change after it.
+
+    Subscribing happens before the snapshot is taken, so no event is missed.
+    Events that are already part of the snapshot are sent again as well,
+    which is harmless as patches replace whole users and channels.
+    """
+    server_id = get_server_id(server)
+    user_subscription = user_change_events.add_subscriber()
+    channel_subscription = channel_change_events.add_subscriber()
+    try:
+        channels, users = get_tree_snapshots(server)
+        yield LiveServerUpdate(
+            sequence=0,
+            snapshot=LiveSnapshot(
+                channels=[Channel(c) for c in channels.values()],
+                users=[User(u, server) for u in users.values()]
+            ),
+            patches=[]
+        )
+
+        sequence = 1
+        while True:
+            events = user_change_events.flush_subscriber(user_subscription) \
+                + channel_change_events.flush_subscriber(channel_subscription)
+            patches = [
+                to_live_patch(e, server)
+                for e in sorted(events, key=lambda e: e._sequence)
+                if get_server_id(e._server) == server_id
+            ]
+
+            if patches:
+                yield LiveServerUpdate(sequence=sequence, snapshot=None, patches=patches)
+                sequence += 1
+
+            await asyncio.sleep(0.5)
+    finally:
+        user_change_events.remove_subscriber(user_subscription)
+        channel_change_events.remove_subscriber(channel_subscription)
+
+
+async def create_log_subscription(server_id: int):
+    """Emit new log entries of a server, polling its log while anyone subscribes"""
+    tail = get_log_tail(server_id)
+    tail.start()
+    try:
+        async for entries in create_subscription(server_log_events, lambda e: int(e.server_id) == server_id):
+            yield entries
+    finally:
+        tail.stop()
+
+
 @strawberry.type
 class Subscription:
     @strawberry.subscription
@@ -46,3 +150,39 @@ class Subscription:
     @strawberry.subscription
     async def channel_change(self) -> typing.AsyncGenerator[list[ChannelChangeEvent], None]:
         return create_subscription(channel_change_events)
+
+    @strawberry.subscription(description="Get the channels and users of a server, then patches as they change. "
+                             "Replaces querying the server and subscribing to its changes separately.")
+    async def live_server(self, server_id: ID) -> typing.AsyncGenerator[LiveServerUpdate, None]:
+        server = get_mumble_server(server_id)
+        if not server:
+            raise ValueError(f"Server with ID {server_id} not found")
+
+        return create_live_subscription(server)
+
+    @strawberry.subscription(description="Get text messages, user changes and channel changes as one stream, in the order they happened. "
+                             "Optionally limited to some types of events, or some servers.")
+    async def events(
+        self,
+        types: list[EventType] | None = None,
+        server_ids: list[ID] | None = None
+    ) -> typing.AsyncGenerator[list[Event], None]:
+        event_types = tuple(event_classes[t] for t in types) if types else None
+        server_ids = {int(s) for s in server_ids} if server_ids else None
+
+        def matches(event) -> bool:
+            if event_types is not None and not isinstance(event, event_types):
+                return False
+
+            return server_ids is None or get_server_id(event._server) in server_ids
+
+        return create_subscription(all_events, matches if event_types or server_ids else None)
+
+    @strawberry.subscription(description="Get entries added to the log of a server, oldest first. "
+                             "The log is polled every `LOG_POLL_INTERVAL` seconds, once for all subscribers.")
+    async def server_log(self, server_id: ID) -> typing.AsyncGenerator[list[LogEntry], None]:
+        server = get_mumble_server(server_id)
+        if not server:
+            raise ValueError(f"Server with ID {server_id} not found")
+
+        return create_log_subscription(get_server_id(server))
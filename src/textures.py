@@ -1,22 +1,32 @@
 
 import base64
+import os
+import time
 from io import BytesIO
-from PIL import Image
+
+# Seconds to remember that a user has no texture before asking murmurd again
+TEXTURE_MISSING_TTL = float(os.environ.get('TEXTURE_MISSING_TTL') or 300)
 
 # Mapping between a [server_id:user_id] -> Data URI
 texture_cache: dict[str, str] = {}
 
+# Mapping between a [server_id:user_id] -> monotonic time to stop treating the texture as missing
+missing_textures: dict[str, float] = {}
+
 
-def texture_to_data_uri(texture) -> str:
+def texture_to_data_uri(texture) -> str | None:
     """Convert a Murmur Texture to a data uri encoded PNG"""
 
     if len(texture) < 1:
         return None
 
+    # PIL is only needed once someone asks for an avatar, keep it off startup
+    from PIL import Image
+
     # Murmur gives us the *original* image data, so we want
     # to try to decode that, crush it to an avatar size, and encode
     image = Image.open(BytesIO(texture))
-    image.thumbnail((128, 128), Image.ANTIALIAS)
+    image.thumbnail((128, 128), Image.LANCZOS)
 
     # Convert image to PNG string
     buffered = BytesIO()
@@ -39,7 +49,21 @@ def get_texture_cache(server_id: str, user_id: str) -> str | None:
     return texture_cache[key]
 
 
-def set_texture_cache(server_id: str, user_id: str, texture: bytes | None) -> str:
+def is_texture_missing(server_id: str, user_id: str) -> bool:
+    """Check if the user recently turned out to have no texture"""
+    key = get_cache_key(server_id, user_id)
+    expires_at = missing_textures.get(key)
+    if expires_at is None:
+        return False
+
+    if expires_at <= time.monotonic():
+        missing_textures.pop(key, None)
+        return False
+
+    return True
+
+
+def set_texture_cache(server_id: str, user_id: str, texture: bytes | None) -> str | None:
     """Cache the raw texture as a PNG data URI and return that URI"""
     if not texture:
         data_uri = None
@@ -47,5 +71,11 @@ def set_texture_cache(server_id: str, user_id: str, texture: bytes | None) -> st
         data_uri = texture_to_data_uri(texture)
 
     key = get_cache_key(server_id, user_id)
-    texture_cache[key] = data_uri
+    if data_uri is None:
+        texture_cache.pop(key, None)
+        missing_textures[key] = time.monotonic() + TEXTURE_MISSING_TTL
+    else:
+        texture_cache[key] = data_uri
+        missing_textures.pop(key, None)
+
     return data_uri
@@ -1,6 +1,8 @@
-
+import base64
 import ipaddress
 
+from graphql import DocumentNode, OperationDefinitionNode
+
 
 def address_tuple_to_ipv6(address):
     """Convert an address tuple to an IPv6Address object"""
@@ -9,3 +11,37 @@ def address_tuple_to_ipv6(address):
     long_form = ':'.join(groups)
 
     return ipaddress.IPv6Address(long_form)
+
+
+def encode_cursor(kind: str, item_id: int) -> str:
+    """Encode an opaque pagination cursor"""
+    return base64.b64encode(f'{kind}:{item_id}'.encode('utf-8')).decode('utf-8')
+
+
+def decode_cursor(kind: str, cursor: str) -> int:
+    """Decode a cursor made by `encode_cursor` back to the item ID"""
+    try:
+        cursor_kind, item_id = base64.b64decode(cursor).decode('utf-8').split(':')
+        if cursor_kind != kind:
+            raise ValueError()
+
+        return int(item_id)
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def get_operation(document: DocumentNode, operation_name: str | None) -> OperationDefinitionNode | None:
+    """Find the operation of a document that will be executed"""
+    for definition in document.definitions:
+        if not isinstance(definition, OperationDefinitionNode):
+            continue
+
+        if not operation_name or (definition.name and definition.name.value == operation_name):
+            return definition
+
+    return None
+
+
+def is_shared_context(context) -> bool:
+    """Check if an operation executes once on behalf of many clients"""
+    return isinstance(context, dict) and context.get('shared_subscription', False)
@@ -0,0 +1,91 @@
+import json
+from typing import Any, AsyncGenerator, Mapping
+
+import msgpack
+from starlette.websockets import WebSocketDisconnect, WebSocketState
+from strawberry.asgi import ASGIWebSocketAdapter
+from strawberry.http.exceptions import NonJsonMessageReceived, NonTextMessageReceived, WebSocketDisconnected
+
+# Value of the `encoding` query parameter selecting MessagePack frames
+MSGPACK_ENCODING = 'msgpack'
+
+
+class EncodedPayload:
+    """Payload of a `next` message, encoded at most once per encoding
+    however many operations it is sent to.
+    """
+
+    __slots__ = ('payload', '_json', '_msgpack')
+
+    def __init__(self, payload: dict[str, Any]):
+        self.payload = payload
+        self._json: str | None = None
+        self._msgpack: bytes | None = None
+
+    def json(self, encode_json) -> str:
+        if self._json is None:
+            self._json = encode_json(self.payload)
+
+        return self._json
+
+    def msgpack(self) -> bytes:
+        if self._msgpack is None:
+            self._msgpack = msgpack.packb(self.payload)
+
+        return self._msgpack
+
+
+class EncodedWebSocketAdapter(ASGIWebSocketAdapter):
+    """Websocket adapter that speaks MessagePack in binary frames instead of
+    JSON in text frames, if the connection was opened with `?encoding=msgpack`.
+
+    The subprotocol messages are the same either way, only their encoding differs.
+    """
+
+    def __init__(self, view, request, response):
+        super().__init__(view, request, response)
+        self.msgpack = response.query_params.get('encoding') == MSGPACK_ENCODING
+
+    async def iter_json(self, *, ignore_parsing_errors: bool = False) -> AsyncGenerator[object, None]:
+        if not self.msgpack:
+            async for message in super().iter_json(ignore_parsing_errors=ignore_parsing_errors):
+                yield message
+            return
+
+        try:
+            while self.ws.application_state != WebSocketState.DISCONNECTED:
+                try:
+                    yield msgpack.unpackb(await self.ws.receive_bytes())
+                except (ValueError, msgpack.UnpackException) as e:
+                    if not ignore_parsing_errors:
+                        raise NonJsonMessageReceived from e
+        except KeyError as e:
+            raise NonTextMessageReceived from e
+        except WebSocketDisconnect:
+            pass
+
+    async def send_json(self, message: Mapping[str, object]) -> None:
+        if not self.msgpack:
+            return await super().send_json(message)
+
+        try:
+            await self.ws.send_bytes(msgpack.packb(message))
+        except WebSocketDisconnect as exc:
+            raise WebSocketDisconnected from exc
+
+    async def send_next(self, operation_id: str, payload: EncodedPayload) -> None:
+        """Send a `next` message around an already encoded payload"""
+        try:
+            if self.msgpack:
+                # A map of 3 entries, with the payload spliced in as is
+                await self.ws.send_bytes(
+                    b'\x83' + msgpack.packb('id') + msgpack.packb(operation_id)
+                    + msgpack.packb('type') + msgpack.packb('next')
+                    + msgpack.packb('payload') + payload.msgpack()
+                )
+            else:
+                await self.ws.send_text(
+                    f'{{"id":{json.dumps(operation_id)},"type":"next","payload":{payload.json(self.view.encode_json)}}}'
+                )
+        except WebSocketDisconnect as exc:
+            raise WebSocketDisconnected from exc
@@ -0,0 +1,43 @@
+import sys
+from pathlib import Path
+
+import Ice
+import pytest
+
+# The modules in src/ import each other by name, as when running from there
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+import slice_loader  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def MumbleServer():
+    return slice_loader.load_slice_module('MumbleServer')
+
+
+class FakeServer:
+    """Stand-in for a server proxy, answering the calls the tested code makes"""
+
+    def __init__(self, server_id: int, bans: list | None = None):
+        self.server_id = server_id
+        self.bans = list(bans or [])
+        self.calls: list[str] = []
+
+    def ice_getIdentity(self):
+        return Ice.Identity(name=f'fake/{self.server_id}', category='')
+
+    def id(self):
+        return self.server_id
+
+    def getBans(self):
+        self.calls.append('getBans')
+        return list(self.bans)
+
+    def setBans(self, bans):
+        self.calls.append('setBans')
+        self.bans = list(bans)
+
+
+@pytest.fixture
+def fake_server():
+    return FakeServer
@@ -0,0 +1,97 @@
+import ipaddress
+import time
+
+import pytest
+
+import bans
+from bans import BanIndex, BanInput, format_network, parse_network, update_bans
+
+
+def make_ban(MumbleServer, address: str, **fields):
+    network = parse_network(address)
+    return MumbleServer.Ban(
+        address=tuple(network.network_address.packed), bits=network.prefixlen, **fields)
+
+
+@pytest.fixture(autouse=True)
+def clear_ban_indexes():
+    bans.ban_indexes.clear()
+    yield
+    bans.ban_indexes.clear()
+
+
+@pytest.mark.parametrize('address, expected', [
+    ('10.0.0.1', '::ffff:a00:1/128'),
+    ('10.1.2.3/8', '::ffff:a00:0/104'),
+    ('2001:db8::1/32', '2001:db8::/32'),
+])
+def test_parse_network(address, expected):
+    assert parse_network(address) == ipaddress.IPv6Network(expected)
+
+
+def test_parse_network_rejects_garbage():
+    with pytest.raises(ValueError, match="Invalid address"):
+        parse_network('10.0.0.256')
+
+
+@pytest.mark.parametrize('address', ['10.0.0.0/8', '192.168.1.7/32', '2001:db8::/32'])
+def test_format_network_round_trip(address):
+    assert format_network(parse_network(address)) == address
+
+
+def test_index_matches_covering_bans(MumbleServer):
+    index = BanIndex([
+        make_ban(MumbleServer, '10.0.0.0/8'),
+        make_ban(MumbleServer, '10.1.0.0/16'),
+        make_ban(MumbleServer, '192.168.0.1'),
+        make_ban(MumbleServer, '2001:db8::/32'),
+    ])
+
+    def match(address):
+        return sorted(format_network(bans.get_ban_network(b)) for b in index.match(parse_network(address).network_address))
+
+    assert match('10.1.2.3') == ['10.0.0.0/8', '10.1.0.0/16']
+    assert match('10.2.0.1') == ['10.0.0.0/8']
+    assert match('192.168.0.1') == ['192.168.0.1/32']
+    assert match('192.168.0.2') == []
+    assert match('2001:db8:1::1') == ['2001:db8::/32']
+
+
+def test_index_skips_expired_bans(MumbleServer):
+    now = int(time.time())
+    index = BanIndex([
+        make_ban(MumbleServer, '10.0.0.0/8', start=now - 100, duration=10),
+        make_ban(MumbleServer, '10.0.0.0/16', start=now - 100, duration=0),
+    ])
+
+    assert [b.bits for b in index.match(parse_network('10.0.0.1').network_address)] == [112]
+
+
+def test_update_bans_adds_replaces_and_removes(MumbleServer, fake_server):
+    server = fake_server(1, [
+        make_ban(MumbleServer, '10.0.0.0/8', reason='old'),
+        make_ban(MumbleServer, '192.168.0.0/16'),
+        make_ban(MumbleServer, '172.16.0.0/12'),
+    ])
+
+    result = update_bans(
+        server,
+        add=[BanInput(address='10.0.0.0/8', reason='new'), BanInput(address='2001:db8::/32')],
+        remove=['172.16.0.0/12', '203.0.113.0/24']
+    )
+
+    assert (result.added, result.removed) == (2, 1)
+    assert sorted((b.address, b.reason) for b in result.bans) == [
+        ('10.0.0.0/8', 'new'), ('192.168.0.0/16', ''), ('2001:db8::/32', '')
+    ]
+    assert server.calls == ['getBans', 'setBans']
+    assert len(server.bans) == 3
+
+
+def test_update_bans_without_changes_skips_set_bans(MumbleServer, fake_server):
+    server = fake_server(2, [make_ban(MumbleServer, '10.0.0.0/8')])
+
+    result = update_bans(server, add=[], remove=['192.168.0.0/16'])
+
+    assert (result.added, result.removed) == (0, 0)
+    assert server.calls == ['getBans']
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from persisted_queries import PersistedQueryError, PersistedQueryStore, hash_query, load_allowlist
+
+QUERY = '{ servers { id } }'
+
+
+def persisted(sha256_hash: str, query: str | None = None) -> dict:
+    data = {'extensions': {'persistedQuery': {'version': 1, 'sha256Hash': sha256_hash}}}
+    if query is not None:
+        data['query'] = query
+
+    return data
+
+
+def error_code(store: PersistedQueryStore, data: dict) -> str:
+    with pytest.raises(PersistedQueryError) as info:
+        store.resolve(data)
+
+    return info.value.code
+
+
+def test_plain_queries_pass_through():
+    data = {'query': QUERY}
+    assert PersistedQueryStore().resolve(data) is data
+
+
+def test_unknown_hash_asks_for_the_query():
+    assert error_code(PersistedQueryStore(), persisted(hash_query(QUERY))) == 'PERSISTED_QUERY_NOT_FOUND'
+
+
+def test_registered_query_is_found_by_hash():
+    store = PersistedQueryStore()
+    store.resolve(persisted(hash_query(QUERY), QUERY))
+
+    assert store.resolve(persisted(hash_query(QUERY)))['query'] == QUERY
+
+
+def test_mismatched_hash_is_rejected():
+    store = PersistedQueryStore()
+
+    assert error_code(store, persisted(hash_query('{ other }'), QUERY)) == 'INTERNAL_SERVER_ERROR'
+    assert store.get(hash_query('{ other }')) is None
+
+
+def test_missing_hash_is_rejected():
+    assert error_code(PersistedQueryStore(), {'extensions': {'persistedQuery': {}}}) == 'PERSISTED_QUERY_NOT_SUPPORTED'
+
+
+def test_least_recently_used_queries_are_evicted():
+    store = PersistedQueryStore(maxsize=2)
+    queries = ['{ a }', '{ b }', '{ c }']
+    store.add(hash_query(queries[0]), queries[0])
+    store.add(hash_query(queries[1]), queries[1])
+    store.get(hash_query(queries[0]))
+    store.add(hash_query(queries[2]), queries[2])
+
+    assert store.get(hash_query(queries[1])) is None
+    assert store.get(hash_query(queries[0])) == queries[0]
+
+
+def test_allowlist_only_runs_listed_documents():
+    store = PersistedQueryStore(allowlist={hash_query(QUERY): QUERY})
+
+    assert store.resolve(persisted(hash_query(QUERY)))['query'] == QUERY
+    assert store.resolve({'query': QUERY})['query'] == QUERY
+    assert error_code(store, {'query': '{ other }'}) == 'PERSISTED_QUERY_NOT_ALLOWED'
+    assert error_code(store, persisted(hash_query('{ other }'))) == 'PERSISTED_QUERY_NOT_ALLOWED'
+    assert error_code(store, persisted(hash_query('{ other }'), '{ other }')) == 'PERSISTED_QUERY_NOT_ALLOWED'
+
+
+def test_load_allowlist_from_a_list(tmp_path):
+    path = tmp_path / 'allowlist.json'
+    path.write_text(json.dumps([QUERY]))
+
+    assert load_allowlist(str(path)) == {hash_query(QUERY): QUERY}
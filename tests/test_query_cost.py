@@ -0,0 +1,75 @@
+import pytest
+import strawberry
+from graphql import FragmentDefinitionNode, parse
+
+import query_cost
+from query_cost import DEFAULT_LIST_SIZE, observe_list_size, selection_cost
+
+
+@strawberry.type
+class User:
+    name: str
+
+    @strawberry.field
+    def texture(self) -> str | None:
+        return None
+
+
+@strawberry.type
+class Server:
+    id: int
+
+    @strawberry.field
+    def users(self) -> list[User]:
+        return []
+
+    @strawberry.field
+    def log(self) -> list[str]:
+        return []
+
+
+@strawberry.type
+class Query:
+    @strawberry.field
+    def servers(self) -> list[Server]:
+        return []
+
+
+schema = strawberry.Schema(query=Query)
+
+
+@pytest.fixture(autouse=True)
+def clear_list_sizes():
+    query_cost._list_sizes.clear()
+    yield
+    query_cost._list_sizes.clear()
+
+
+def cost(query: str, variables: dict | None = None) -> int:
+    document = parse(query)
+    fragments = {d.name.value: d for d in document.definitions if isinstance(d, FragmentDefinitionNode)}
+    return selection_cost(
+        schema._schema.query_type, document.definitions[0].selection_set, fragments, variables or {})
+
+
+def test_plain_fields_are_free():
+    assert cost('{ servers { id } }') == 0
+
+
+def test_unresolved_lists_use_default_size():
+    # servers: 10 x (users: 1 + 10 users x texture: 2)
+    assert cost('{ servers { users { name texture } } }') == DEFAULT_LIST_SIZE * (1 + DEFAULT_LIST_SIZE * 2)
+
+
+def test_observed_list_sizes_use_the_largest_owner():
+    observe_list_size('Query.servers', None, 2)
+    observe_list_size('Server.users', 1, 3)
+    observe_list_size('Server.users', 2, 5)
+
+    assert cost('{ servers { users { texture } } }') == 2 * (1 + 5 * 2)
+
+
+def test_fragments_are_counted():
+    observe_list_size('Query.servers', None, 1)
+
+    assert cost('{ servers { ...S } } fragment S on Server { log ... on Server { users { name } } }') == 2
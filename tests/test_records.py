@@ -0,0 +1,58 @@
+import importlib
+
+import pytest
+
+from records import ChannelRecord, UserRecord
+
+USER_FIELDS = dict(
+    session=3, userid=7, name='alice', comment='hi', channel=2,
+    mute=False, deaf=False, suppress=False, prioritySpeaker=True, selfMute=True, selfDeaf=False, recording=False,
+    onlinesecs=60, idlesecs=5, bytespersec=4000,
+    os='Linux', osversion='6.1', version=0x10500, release='1.5.0', address=[0] * 10 + [255, 255, 10, 0, 0, 1],
+)
+
+
+def test_user_from_ice(MumbleServer):
+    user = UserRecord.from_ice(MumbleServer.User(version2=0x1000500000000, **USER_FIELDS))
+
+    assert user.session == 3
+    assert user.name == 'alice'
+    assert user.version2 == 0x1000500000000
+    assert user.address == bytes(USER_FIELDS['address'])
+
+
+def test_user_from_legacy_slice_defaults_version2():
+    Murmur = importlib.import_module('Murmur')
+    user = UserRecord.from_ice(Murmur.User(**USER_FIELDS))
+
+    assert user.version2 == 0
+    assert user.version == 0x10500
+
+
+def test_user_to_ice_round_trip(MumbleServer):
+    user = UserRecord.from_ice(MumbleServer.User(version2=1, **USER_FIELDS))
+    struct = user.to_ice()
+
+    assert isinstance(struct, MumbleServer.User)
+    assert UserRecord.from_ice(struct) == user
+
+
+def test_records_are_immutable(MumbleServer):
+    user = UserRecord.from_ice(MumbleServer.User(**USER_FIELDS))
+
+    with pytest.raises(AttributeError):
+        user.name = 'bob'
+
+
+def test_repeated_strings_are_shared(MumbleServer):
+    first = UserRecord.from_ice(MumbleServer.User(**{**USER_FIELDS, 'os': ''.join(['Lin', 'ux'])}))
+    second = UserRecord.from_ice(MumbleServer.User(**{**USER_FIELDS, 'os': ''.join(['Li', 'nux'])}))
+
+    assert first.os is second.os
+
+
+def test_channel_links_are_a_tuple(MumbleServer):
+    channel = ChannelRecord.from_ice(MumbleServer.Channel(id=1, name='Lobby', parent=0, links=[2, 3]))
+
+    assert channel.links == (2, 3)
+    assert channel.as_dict()['name'] == 'Lobby'
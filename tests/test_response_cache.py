@@ -0,0 +1,52 @@
+from graphql import ExecutionResult, parse
+
+from response_cache import ResponseCache, is_cacheable
+
+
+def test_results_expire():
+    cache = ResponseCache(ttl=0)
+    cache.set('q', ExecutionResult(data={}), {1}, cache.generation)
+
+    assert cache.get('q') is None
+
+
+def test_invalidation_evicts_dependent_results_only():
+    cache = ResponseCache(ttl=60)
+    cache.set('one', ExecutionResult(data={'a': 1}), {1}, cache.generation)
+    cache.set('both', ExecutionResult(data={'a': 2}), {1, 2}, cache.generation)
+    cache.set('two', ExecutionResult(data={'a': 3}), {2}, cache.generation)
+
+    cache.invalidate_server(1)
+
+    assert cache.get('one') is None
+    assert cache.get('both') is None
+    assert cache.get('two').data == {'a': 3}
+
+
+def test_results_computed_across_an_invalidation_are_not_stored():
+    cache = ResponseCache(ttl=60)
+    generation = cache.generation
+    cache.invalidate_server(1)
+
+    cache.set('stale', ExecutionResult(data={}), {1}, generation)
+    cache.set('other', ExecutionResult(data={}), {2}, generation)
+
+    assert cache.get('stale') is None
+    assert cache.get('other') is not None
+
+
+def test_least_recently_used_results_are_evicted():
+    cache = ResponseCache(ttl=60, maxsize=2)
+    for key in ('a', 'b'):
+        cache.set(key, ExecutionResult(data={}), {1}, cache.generation)
+    cache.get('a')
+    cache.set('c', ExecutionResult(data={}), {1}, cache.generation)
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+
+
+def test_documents_reading_uncached_data_are_not_cacheable():
+    assert is_cacheable(parse('{ servers { users { name } } }'))
+    assert not is_cacheable(parse('{ servers { bans { address } } }'))
+    assert not is_cacheable(parse('{ servers { ...F } } fragment F on Server { log { text } }'))
@@ -0,0 +1,87 @@
+import pytest
+
+from records import ChannelRecord
+from snapshots import ChannelSnapshot, IndexedSnapshot
+
+
+def channel(channel_id: int, parent: int, name: str = '') -> ChannelRecord:
+    return ChannelRecord(
+        id=channel_id, name=name or f'channel{channel_id}', parent=parent,
+        links=(), description='', temporary=False, position=0
+    )
+
+
+@pytest.fixture
+def snapshot():
+    # 0 -> 1 -> 3, 0 -> 2 -> 4 -> 5
+    return ChannelSnapshot([
+        channel(0, -1), channel(3, 1), channel(1, 0), channel(2, 0), channel(5, 4), channel(4, 2)
+    ])
+
+
+def test_items_are_ordered_by_id(snapshot):
+    assert [c.id for c in snapshot.values()] == [0, 1, 2, 3, 4, 5]
+
+
+def test_lookup_by_index(snapshot):
+    assert [c.id for c in snapshot.lookup('parent', 0)] == [1, 2]
+    assert snapshot.lookup('parent', 99) == []
+
+
+def test_descendants(snapshot):
+    assert snapshot.descendants('parent', [2]) == {2, 4, 5}
+    assert snapshot.descendants('parent', [1, 4]) == {1, 3, 4, 5}
+
+
+def test_pages(snapshot):
+    page, has_next_page, total_count = snapshot.page(2)
+    assert [c.id for c in page] == [0, 1]
+    assert has_next_page
+    assert total_count == 6
+
+    page, has_next_page, _ = snapshot.page(2, after=3)
+    assert [c.id for c in page] == [4, 5]
+    assert not has_next_page
+
+
+def test_page_of_index_with_predicate(snapshot):
+    page, has_next_page, total_count = snapshot.page(
+        10, index=('parent', 0), predicate=lambda c: c.id != 1)
+
+    assert [c.id for c in page] == [2]
+    assert not has_next_page
+    assert total_count == 1
+
+
+def test_empty_page(snapshot):
+    page, has_next_page, _ = snapshot.page(0, after=4)
+
+    assert page == []
+    assert has_next_page
+
+
+def test_negative_page_size_is_rejected(snapshot):
+    with pytest.raises(ValueError):
+        snapshot.page(-1)
+
+
+def test_upsert_moves_item_between_index_entries(snapshot):
+    snapshot.upsert(channel(3, 2, 'moved'))
+
+    assert [c.id for c in snapshot.lookup('parent', 1)] == []
+    assert [c.id for c in snapshot.lookup('parent', 2)] == [3, 4]
+    assert snapshot.get(3).name == 'moved'
+    assert len(snapshot.values()) == 6
+
+
+def test_remove(snapshot):
+    snapshot.remove(4)
+
+    assert snapshot.get(4) is None
+    assert [c.id for c in snapshot.lookup('parent', 2)] == []
+    snapshot.remove(4)
+
+
+def test_get_id_must_be_implemented():
+    with pytest.raises(TypeError):
+        IndexedSnapshot([])
@@ -0,0 +1,18 @@
+import pytest
+
+from utils import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    assert decode_cursor('user', encode_cursor('user', 42)) == 42
+
+
+def test_cursor_of_other_kind_is_rejected():
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor('channel', encode_cursor('user', 42))
+
+
+@pytest.mark.parametrize('cursor', ['', 'not base64!', 'None', encode_cursor('user', 1)[:-2]])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor('user', cursor)